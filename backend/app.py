@@ -2,14 +2,28 @@
 Flask Backend for the Standards Library Maintenance Tool
 This application serves a REST API for the frontend to interact with.
 """
-import os
+import io
 import json
+import os
+import time
 from functools import wraps
-from flask import Flask, jsonify, request, send_from_directory, session, redirect, url_for
-from flask_cors import CORS
+
 from authlib.integrations.flask_client import OAuth
-from werkzeug.middleware.proxy_fix import ProxyFix
+from flask import (
+    Flask,
+    Response,
+    jsonify,
+    redirect,
+    request,
+    send_file,
+    send_from_directory,
+    session,
+    url_for,
+)
+from flask_cors import CORS
 from library_controller import LibraryController
+from user_registry import UserRegistry
+from werkzeug.middleware.proxy_fix import ProxyFix
 
 # Initialize the Flask application
 app = Flask(__name__)
@@ -27,11 +41,9 @@ google = oauth.register(
 
 # Load Users
 USERS_FILE = os.path.join(os.path.dirname(__file__), 'users.json')
-def load_users():
-    if os.path.exists(USERS_FILE):
-        with open(USERS_FILE, 'r') as f:
-            return json.load(f).get('users', {})
-    return {}
+user_registry = UserRegistry(USERS_FILE)
+# `kill -HUP <worker pid>` makes a worker re-read users.json right away
+user_registry.reload_on_signal()
 
 def login_required(f):
     @wraps(f)
@@ -47,8 +59,7 @@ def admin_required(f):
         if 'user' not in session:
              return jsonify({"message": "Authentication required"}), 401
         user_email = session['user'].get('email')
-        users = load_users()
-        if users.get(user_email) != 'admin':
+        if user_registry.get_role(user_email) != 'admin':
              return jsonify({"message": "Admin access required"}), 403
         return f(*args, **kwargs)
     return decorated_function
@@ -56,6 +67,38 @@ def admin_required(f):
 # Create a single, shared instance of our business logic controller
 controller = LibraryController()
 
+def cached_json_response(payload):
+    """
+    Builds a response from a pre-serialized (body, etag) payload. Answers
+    with 304 Not Modified when the client already holds the current version.
+    """
+    body, etag = payload
+    response = app.response_class(body, mimetype="application/json")
+    response.set_etag(etag)
+    # Let browsers keep the body but always revalidate it with the ETag
+    response.headers["Cache-Control"] = "no-cache"
+    return response.make_conditional(request)
+
+def wants_async() -> bool:
+    """
+    Whether the client asked, with ?async=1 or "async": true, to run the
+    operation as a job
+    """
+    flag = request.args.get("async") or request.form.get("async")
+    if flag is None and request.is_json:
+        flag = (request.get_json(silent=True) or {}).get("async")
+    return str(flag).lower() in ("1", "true", "yes")
+
+def job_accepted(job):
+    """202 Accepted pointing at the job's status, or 503 if the job queue is full"""
+    if job is None:
+        message = "Too many background jobs are pending, try again later"
+        return jsonify({"message": message}), 503
+    response = jsonify(job.to_dict())
+    response.status_code = 202
+    response.headers["Location"] = url_for("get_job_route", job_id=job.id)
+    return response
+
 # --- Auth Routes ---
 
 @app.route('/login')
@@ -71,12 +114,12 @@ def authorize():
         user_info = google.userinfo()
     
     # Check if user is allowed
-    users = load_users()
     email = user_info.get('email')
+    role = user_registry.get_role(email)
     
-    if email in users:
+    if role is not None:
         session['user'] = user_info
-        session['role'] = users[email]
+        session['role'] = role
         return redirect('/') # Redirect to home page
     else:
         return jsonify({"message": "User not authorized"}), 403
@@ -110,9 +153,28 @@ def get_library_info():
 def get_standards():
     """
     An endpoint to get a list of all standards in the library.
+
+    With any of the query parameters limit, cursor, sort or fields (a comma
+    separated list), returns one page instead:
+    {"standards": [...], "total": n, "next_cursor": "..." or null}
     """
-    standards = controller.get_all_standards()
-    return jsonify(standards)
+    args = request.args
+    if not any(name in args for name in ("limit", "cursor", "sort", "fields")):
+        return cached_json_response(controller.get_standards_payload())
+
+    fields = args.get("fields") or None
+    if fields is not None:
+        fields = [name.strip() for name in fields.split(",") if name.strip()]
+    try:
+        page = controller.get_standards_page(
+            limit=args.get("limit"),
+            cursor=args.get("cursor"),
+            sort=args.get("sort", "id"),
+            fields=fields
+        )
+        return jsonify(page)
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
 
 @app.route("/api/standards", methods=["POST"])
 @admin_required
@@ -134,8 +196,124 @@ def get_clusters():
     """
     An endpoint to get a list of all valid clusters.
     """
-    clusters = controller.get_all_clusters()
-    return jsonify(clusters)
+    return cached_json_response(controller.get_clusters_payload())
+
+@app.route("/api/validation", methods=["GET"])
+@login_required
+def get_validation():
+    """
+    An endpoint to get the validation findings of the current library.
+    """
+    return cached_json_response(controller.get_validation_payload())
+
+@app.route("/api/changes", methods=["GET"])
+@login_required
+def get_changes():
+    """
+    An endpoint to get the clusters and standards changed since a revision,
+    e.g. /api/changes?since=42. Answers with a full snapshot ("full": true)
+    when the changes since that revision are no longer known.
+    """
+    since = request.args.get("since")
+    try:
+        since = int(since) if since is not None else None
+    except ValueError:
+        return jsonify({"message": "'since' must be a revision number"}), 400
+    return jsonify(controller.get_changes_since(since))
+
+# Seconds between checks for changes saved by other workers while a client listens
+EVENTS_POLL_INTERVAL = 2.0
+# Seconds between heartbeat comments that keep idle event streams open through proxies
+EVENTS_HEARTBEAT_INTERVAL = 15.0
+
+@app.route("/api/events", methods=["GET"])
+@login_required
+def library_events():
+    """
+    A server-sent events stream of library changes. Sends a "hello" event
+    with the current revision, then a "change" event {entity, id, revision}
+    for every committed change, or a "resync" event {revision} when the
+    client should re-fetch (e.g. via /api/changes) because it fell behind.
+    """
+    subscription = controller.events.subscribe()
+    if subscription is None:
+        message = "Too many event listeners, please poll instead"
+        return jsonify({"message": message}), 503
+
+    def stream():
+        hello = json.dumps({"revision": controller.revision})
+        yield f"retry: 5000\nevent: hello\ndata: {hello}\n\n"
+        last_sent = time.monotonic()
+        while True:
+            event = subscription.get(timeout=EVENTS_POLL_INTERVAL)
+            if event is None:
+                # Changes from other workers reach this one's subscribers through a
+                # refresh
+                controller.refresh()
+                if time.monotonic() - last_sent >= EVENTS_HEARTBEAT_INTERVAL:
+                    last_sent = time.monotonic()
+                    yield ": heartbeat\n\n"
+                continue
+            name, data = event
+            last_sent = time.monotonic()
+            yield f"event: {name}\ndata: {json.dumps(data)}\n\n"
+
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    response = Response(stream(), mimetype="text/event-stream", headers=headers)
+    # Runs when the client disconnects (noticed at the next write), even if the
+    # stream never started
+    response.call_on_close(subscription.close)
+    return response
+
+@app.route("/api/search", methods=["GET"])
+@login_required
+def search_standards():
+    """
+    An endpoint to search the text of all standards, e.g. /api/search?q=fair&limit=10
+    """
+    try:
+        results = controller.search_standards(
+            request.args.get("q", ""), request.args.get("limit", 20)
+        )
+        return jsonify(results)
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+
+@app.route("/api/standards/similar", methods=["POST"])
+@login_required
+def find_similar_standards():
+    """
+    An endpoint to find the standards with the closest MAC composition to an
+    existing standard or to a given MAC vector. Expects a JSON body.
+    """
+    query = request.get_json(silent=True) or {}
+    try:
+        return jsonify(controller.find_similar_standards(query))
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+
+@app.route("/api/score", methods=["POST"])
+@login_required
+def score_profiles():
+    """
+    An endpoint to rank the standards against one or many MAC profiles.
+    Expects a JSON body with "profiles" (or a single "profile"), and
+    optionally "k", "weighted" and "cluster_ids".
+    """
+    data = request.get_json(silent=True) or {}
+    profiles = data.get("profiles", data.get("profile"))
+    if profiles is None:
+        return jsonify({"message": "Provide 'profiles' or 'profile'."}), 400
+    try:
+        results = controller.score_profiles(
+            profiles,
+            k=data.get("k", 10),
+            weighted=bool(data.get("weighted", True)),
+            cluster_ids=data.get("cluster_ids")
+        )
+        return jsonify({"results": results})
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
 
 @app.route("/api/standards/<string:standard_id>", methods=["PUT"])
 @admin_required
@@ -168,6 +346,8 @@ def delete_standard_route(standard_id):
 @admin_required
 def create_backup_route():
     """Creates a new timestamped backup of the library."""
+    if wants_async():
+        return job_accepted(controller.start_backup_job())
     try:
         backup_filename = controller.create_backup()
         return jsonify({"message": "Backup created successfully", "filename": backup_filename}), 201
@@ -185,9 +365,12 @@ def get_backups_route():
 @admin_required
 def download_backup_route(filename):
     """Serves a specific backup file for download."""
-    # Ask the controller for the correct backup directory path
-    backup_dir = controller.file_manager.backups_dir
-    return send_from_directory(backup_dir, filename, as_attachment=True)
+    # Stored backups are compressed, so always serve the decompressed content
+    content = controller.get_backup_content(filename)
+    if content is None:
+        return jsonify({"message": "Backup file not found"}), 404
+    return send_file(io.BytesIO(content), mimetype="application/json",
+                     as_attachment=True, download_name=filename)
 
 @app.route("/api/backups/<string:filename>", methods=["DELETE"])
 @admin_required
@@ -205,8 +388,16 @@ def restore_from_backup_route():
     if 'backup_file' not in request.files:
         return jsonify({"message": "No file part in the request"}), 400
     file = request.files['backup_file']
-    if controller.restore_from_file(file):
-        return jsonify({"message": "Library restored successfully"}), 200
+    if wants_async():
+        return job_accepted(controller.start_restore_upload_job(file))
+    try:
+        stats = controller.restore_from_file(file)
+    except ValueError as e:
+        # The upload was rejected and the current library kept
+        return jsonify({"message": f"Restore rejected: {e}"}), 400
+    if stats is not None:
+        message = "Library restored successfully"
+        return jsonify({"message": message, "stats": stats}), 200
     else:
         return jsonify({"message": "Restore failed. Invalid file or server error."}), 500
 
@@ -214,6 +405,8 @@ def restore_from_backup_route():
 @admin_required
 def restore_from_server_backup_route(filename):
     """Restores the library from a specific backup file on the server."""
+    if wants_async():
+        return job_accepted(controller.start_restore_backup_job(filename))
     if controller.restore_from_backup(filename):
         return jsonify({"message": "Library restored successfully"}), 200
     else:
@@ -224,14 +417,62 @@ def restore_from_server_backup_route(filename):
 @app.route("/api/export", methods=["POST"])
 @login_required
 def export_library_route():
-    """Exports the library with specified filters."""
-    export_options = request.get_json()
+    """
+    Exports the library with specified filters. With format "ndjson" (one
+    record per line) or "stream" (the regular JSON document), the export is
+    streamed to the client as it is serialized.
+    """
+    export_options = request.get_json() or {}
+    export_format = request.args.get("format") or export_options.get("format")
+    if wants_async():
+        # Written to the exports directory; the job result names the file
+        return job_accepted(controller.start_export_job(export_options))
+    if export_format in ("ndjson", "stream"):
+        try:
+            chunks = controller.stream_exported_data(
+                export_options, ndjson=(export_format == "ndjson")
+            )
+        except Exception as e:
+            return jsonify({"message": f"Export failed: {str(e)}"}), 500
+        if export_format == "ndjson":
+            mimetype = "application/x-ndjson"
+        else:
+            mimetype = "application/json"
+        return app.response_class(chunks, mimetype=mimetype)
+
     try:
         exported_data = controller.get_exported_data(export_options)
         return jsonify(exported_data), 200
     except Exception as e:
         return jsonify({"message": f"Export failed: {str(e)}"}), 500
 
+@app.route("/api/exports/<string:filename>", methods=["GET"])
+@login_required
+def download_export_route(filename):
+    """Serves an export file written by an export job."""
+    export_path = controller.get_export_path(filename)
+    if export_path is None:
+        return jsonify({"message": "Export file not found"}), 404
+    return send_file(
+        export_path, mimetype="application/json", as_attachment=True,
+        download_name=filename
+    )
+
+# --- Background Jobs ---
+
+@app.route("/api/jobs/<string:job_id>", methods=["GET"])
+@login_required
+def get_job_route(job_id):
+    """Status, progress and, once finished, result or error of a background job."""
+    job = controller.get_job(job_id)
+    if job is None:
+        return jsonify({"message": "Job not found"}), 404
+    # Any user may export, but backups and restores are for admins only
+    role = user_registry.get_role(session['user'].get('email'))
+    if job["kind"] != "export" and role != 'admin':
+        return jsonify({"message": "Admin access required"}), 403
+    return jsonify(job)
+
 @app.route("/api/import", methods=["POST"])
 @admin_required
 def import_library_route():
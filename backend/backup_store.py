@@ -0,0 +1,463 @@
+"""
+Content-addressed, compressed storage for library backups
+"""
+import gzip
+import hashlib
+import json
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, ContextManager, Dict, List, Optional, Tuple
+
+try:
+    import zstandard
+except ImportError:  # Optional: fall back to gzip
+    zstandard = None
+
+# Plain-file backups written before the store existed; indexed when the manifest
+# is built
+LEGACY_PATTERN = "library_backup_*.json"
+
+# Top-level keys of a library file that hold lists of entities with IDs
+_ENTITY_KEYS = ("clusters", "standards")
+
+def _canonical_hash(data: dict) -> str:
+    """Hash of the data itself, independent of formatting and key order"""
+    canonical = json.dumps(
+        data, sort_keys=True, separators=(",", ":"), ensure_ascii=False
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+def diff_snapshots(base: dict, new: dict) -> dict:
+    """
+    Describe how to turn one library file's data into another: the entities
+    (clusters and standards) that were added, changed or deleted, the other
+    top-level fields, and the entity order if it is not the natural one
+    (base order without deletions, followed by additions).
+    """
+    delta = {
+        "keys": list(new),
+        "fields": {key: value for key, value in new.items() if key not in _ENTITY_KEYS}
+    }
+    for key in _ENTITY_KEYS:
+        old_items = {item["id"]: item for item in base.get(key, [])}
+        new_items = new.get(key, [])
+        new_ids = [item["id"] for item in new_items]
+        present = set(new_ids)
+        changes = {
+            "put": [item for item in new_items if old_items.get(item["id"]) != item],
+            "delete": [item_id for item_id in old_items if item_id not in present]
+        }
+        natural = [item_id for item_id in old_items if item_id in present]
+        natural += [item_id for item_id in new_ids if item_id not in old_items]
+        if natural != new_ids:
+            changes["order"] = new_ids
+        delta[key] = changes
+    return delta
+
+def apply_delta(base: dict, delta: dict) -> dict:
+    """Rebuild the data that diff_snapshots(base, new) was computed from"""
+    entities = {}
+    for key in _ENTITY_KEYS:
+        changes = delta[key]
+        items = {item["id"]: item for item in base.get(key, [])}
+        for item_id in changes["delete"]:
+            items.pop(item_id, None)
+        for item in changes["put"]:
+            items[item["id"]] = item
+        order = changes.get("order")
+        if order is not None:
+            entities[key] = [items[item_id] for item_id in order]
+        else:
+            entities[key] = list(items.values())
+    return {
+        key: entities[key] if key in _ENTITY_KEYS else delta["fields"][key]
+        for key in delta["keys"]
+    }
+
+class BackupStore:
+    """
+    Stores library snapshots as compressed, content-addressed objects under
+    objects/, plus a manifest listing the backups (newest first) as entries:
+
+        {"filename": "library_backup_<timestamp>.json", "created": iso time,
+         "hash": sha256 of the file, "data_hash": sha256 of its canonical data,
+         "size": uncompressed bytes, "stored_size": bytes, "object": object name,
+         "kind": "full", "delta" or "file", "base": filename (deltas only),
+         "depth": deltas since the last full backup,
+         "revision": library revision, "standard_count": number of standards}
+
+    The filename is the name clients use for a backup; no file has that name,
+    except for "file" entries: plain backup files from before the store
+    existed, which are indexed when the manifest is built and otherwise left
+    where they are. The manifest is the only thing listing backups reads, and
+    it is only rebuilt when missing or written by an older version.
+
+    A "full" backup (keyframe) stores the whole file. A "delta" stores only
+    the clusters and standards that differ from its base, the next older
+    backup, so a long history costs about the size of what changed. Every
+    KEYFRAME_INTERVAL-th backup, and any backup whose delta would not be much
+    smaller, is stored in full to keep restore chains short. Restoring a
+    delta replays the chain from the nearest keyframe. Deleting a backup that
+    another one is based on first re-encodes that successor, so no chain breaks.
+
+    A backup identical to the newest one is not recorded again, and identical
+    objects are stored once. Objects are compressed with zstd when the
+    zstandard package is installed, gzip otherwise; both can be read back
+    regardless of which is used for new objects.
+    """
+
+    MANIFEST_NAME = "manifest.json"
+    # Version 2 added legacy files, revisions and standard counts
+    MANIFEST_VERSION = 2
+    # A full backup is stored at least every this many backups
+    KEYFRAME_INTERVAL = 20
+    # Store a delta only if it is smaller than this fraction of a full backup
+    MAX_DELTA_RATIO = 0.5
+
+    def __init__(self, directory: Path, atomic_write: Callable[..., ContextManager],
+                 lock: Callable[[], ContextManager]):
+        self.directory = directory
+        self.objects_dir = directory / "objects"
+        self.manifest_file = directory / self.MANIFEST_NAME
+        # FileManager._atomic_write: (path, mode) -> context manager yielding a file
+        self._atomic_write = atomic_write
+        # FileManager.write_lock, taken to rebuild the manifest
+        self._lock = lock
+        # (filename, data hash, data) of the newest backup, so the next delta
+        # skips the chain replay
+        self._newest: Optional[Tuple[str, str, dict]] = None
+        # (manifest file signature, entries), so listing reads the manifest
+        # only when it changed
+        self._cached: Optional[Tuple[Tuple[int, int, int], List[Dict[str, Any]]]] = None
+
+    # --- Manifest ---
+
+    def entries(self) -> List[Dict[str, Any]]:
+        """All backups, newest first. The list is shared and must not be modified."""
+        # Taken before reading, so a manifest replaced meanwhile is read again next time
+        signature = self._manifest_signature()
+        cached = self._cached
+        if signature is not None and cached is not None and cached[0] == signature:
+            return cached[1]
+
+        manifest = self._read_manifest()
+        if self._outdated(manifest):
+            with self._lock():
+                # Another worker may have rebuilt it while we waited
+                manifest = self._read_manifest()
+                if self._outdated(manifest):
+                    old_entries = manifest["backups"] if manifest else []
+                    self._save_entries(self._rebuild_manifest(old_entries))
+            return self.entries()
+
+        self._cached = (signature, manifest["backups"])
+        return manifest["backups"]
+
+    def get(self, filename: str) -> Optional[Dict[str, Any]]:
+        entries = self.entries()
+        return next((entry for entry in entries if entry["filename"] == filename), None)
+
+    def _outdated(self, manifest: Optional[Dict[str, Any]]) -> bool:
+        """Whether a manifest is missing or written by an older version"""
+        return manifest is None or manifest.get("version", 1) < self.MANIFEST_VERSION
+
+    def _save_entries(self, entries: List[Dict[str, Any]]):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with self._atomic_write(self.manifest_file) as f:
+            manifest = {"version": self.MANIFEST_VERSION, "backups": entries}
+            json.dump(manifest, f, indent=1)
+
+    def _manifest_signature(self) -> Optional[Tuple[int, int, int]]:
+        try:
+            stat = self.manifest_file.stat()
+        except FileNotFoundError:
+            return None
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    def _read_manifest(self) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self.manifest_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _rebuild_manifest(self, entries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Bring entries from an older manifest up to date, and add the legacy
+        backup files not yet listed. Reads every backup once.
+        """
+        result = []
+        for entry in entries:
+            if "revision" not in entry:
+                try:
+                    summary = self._summary(self._load_data(entry, entries))
+                    entry = dict(entry, **summary)
+                except Exception as e:
+                    print(f"Error reading backup {entry['filename']}: {e}")
+                    entry = dict(entry, revision=None, standard_count=None)
+            result.append(entry)
+
+        listed = {entry["filename"] for entry in entries}
+        for path in self.directory.glob(LEGACY_PATTERN):
+            if path.name in listed:
+                continue
+            content = path.read_bytes()
+            try:
+                summary = self._summary(json.loads(content))
+            except (ValueError, AttributeError, TypeError):
+                # Still listed, so it can be downloaded or deleted; restoring it
+                # fails cleanly
+                summary = {"revision": None, "standard_count": None}
+            created = datetime.fromtimestamp(path.stat().st_mtime)
+            result.append({
+                "filename": path.name,
+                "created": created.isoformat(timespec="seconds"),
+                "hash": hashlib.sha256(content).hexdigest(),
+                "size": len(content),
+                "stored_size": len(content),
+                "kind": "file",
+                "depth": 0,
+                **summary
+            })
+
+        # Stable, so backups created in the same second keep their order
+        result.sort(key=lambda entry: entry["created"], reverse=True)
+        return result
+
+    @staticmethod
+    def _summary(data: dict) -> Dict[str, Any]:
+        return {
+            "revision": data.get("revision", 0),
+            "standard_count": len(data.get("standards", []))
+        }
+
+    # --- Objects ---
+
+    @staticmethod
+    def _compress(content: bytes) -> Tuple[bytes, str]:
+        if zstandard is not None:
+            return zstandard.ZstdCompressor(level=10).compress(content), ".zst"
+        return gzip.compress(content, compresslevel=6), ".gz"
+
+    @staticmethod
+    def _decompress(data: bytes, name: str) -> bytes:
+        if name.endswith(".zst"):
+            if zstandard is None:
+                raise RuntimeError("Reading this backup requires the zstandard package")
+            return zstandard.ZstdDecompressor().decompress(data)
+        return gzip.decompress(data)
+
+    def _object_name(self, entry: Dict[str, Any]) -> Optional[str]:
+        """The object holding a backup, or None for a legacy plain file"""
+        if entry.get("kind") == "file":
+            return None
+        if "object" in entry:
+            return entry["object"]
+        # Entries written before deltas existed: a full object named by the file hash
+        for suffix in (".json.zst", ".json.gz"):
+            if (self.objects_dir / f"{entry['hash']}{suffix}").exists():
+                return f"{entry['hash']}{suffix}"
+        raise FileNotFoundError(f"Backup object for {entry['filename']} is missing")
+
+    def _write_object(self, content: bytes, kind: str) -> Tuple[str, int]:
+        """
+        Store content under its hash unless already present; returns the
+        object name and stored size
+        """
+        compressed, suffix = self._compress(content)
+        extension = ".json" if kind == "full" else ".delta.json"
+        name = f"{hashlib.sha256(content).hexdigest()}{extension}{suffix}"
+        path = self.objects_dir / name
+        if not path.exists():
+            self.objects_dir.mkdir(parents=True, exist_ok=True)
+            with self._atomic_write(path, 'wb') as f:
+                f.write(compressed)
+        return name, len(compressed)
+
+    def _read_object(self, name: str) -> bytes:
+        path = self.objects_dir / name
+        content = self._decompress(path.read_bytes(), name)
+        if hashlib.sha256(content).hexdigest() != name.split(".", 1)[0]:
+            raise ValueError(f"Backup object {name} is corrupt")
+        return content
+
+    def _read_content(self, entry: Dict[str, Any]) -> bytes:
+        """The file content of a full or legacy backup"""
+        if entry.get("kind") == "file":
+            return (self.directory / entry["filename"]).read_bytes()
+        return self._read_object(self._object_name(entry))
+
+    # --- Snapshots ---
+
+    def _load_data(self, entry: Dict[str, Any], entries: List[Dict[str, Any]]) -> dict:
+        """
+        The library data of a backup, replaying its delta chain from the
+        nearest keyframe
+        """
+        newest = self._newest
+        if newest and newest[:2] == (entry["filename"], entry.get("data_hash")):
+            return self._newest[2]
+
+        by_name = {e["filename"]: e for e in entries}
+        chain = [entry]
+        while chain[-1].get("kind", "full") == "delta":
+            chain.append(by_name[chain[-1]["base"]])
+
+        data = json.loads(self._read_content(chain[-1]))
+        for delta_entry in reversed(chain[:-1]):
+            delta = json.loads(self._read_object(delta_entry["object"]))
+            data = apply_delta(data, delta)
+        if "data_hash" in entry and _canonical_hash(data) != entry["data_hash"]:
+            raise ValueError(
+                f"Backup {entry['filename']} could not be rebuilt correctly"
+            )
+        return data
+
+    def _encode(self, data: dict, content: Optional[bytes],
+                base: Optional[Dict[str, Any]],
+                entries: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Store data as a delta against base if that is worthwhile, in full
+        otherwise. Returns the storage fields of its entry. `content` is the
+        original file content, if any, so full backups keep its exact bytes.
+        """
+        if content is None:
+            content = json.dumps(data, indent=2, ensure_ascii=False).encode("utf-8")
+        full_size = len(self._compress(content)[0])
+
+        base_data = None
+        if base is not None and base.get("depth", 0) + 1 < self.KEYFRAME_INTERVAL:
+            try:
+                base_data = self._load_data(base, entries)
+            except Exception as e:
+                # A damaged base must not block new backups; start a new chain instead
+                print(
+                    f"Error reading backup {base['filename']}, "
+                    f"storing a full backup: {e}"
+                )
+
+        if base_data is not None:
+            delta = diff_snapshots(base_data, data)
+            delta_content = json.dumps(
+                delta, separators=(",", ":"), ensure_ascii=False
+            ).encode("utf-8")
+            delta_size = len(self._compress(delta_content)[0])
+            if delta_size < full_size * self.MAX_DELTA_RATIO:
+                name, stored_size = self._write_object(delta_content, "delta")
+                return {"kind": "delta", "base": base["filename"],
+                        "depth": base.get("depth", 0) + 1,
+                        "object": name, "stored_size": stored_size}
+
+        name, stored_size = self._write_object(content, "full")
+        return {"kind": "full", "depth": 0, "object": name, "stored_size": stored_size}
+
+    # --- Backups ---
+
+    def add(self, content: bytes, filename: str) -> Dict[str, Any]:
+        """
+        Record a backup of the given library file content and return its entry.
+        If the newest backup has the same content, returns that entry instead.
+        """
+        content_hash = hashlib.sha256(content).hexdigest()
+        entries = self.entries()
+        if entries and entries[0]["hash"] == content_hash:
+            return entries[0]
+
+        names = {entry["filename"] for entry in entries}
+        unique_name, counter = filename, 1
+        while unique_name in names:
+            counter += 1
+            unique_name = filename.replace(".json", f"_{counter}.json")
+
+        data = json.loads(content)
+        entry = {
+            "filename": unique_name,
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "hash": content_hash,
+            "data_hash": _canonical_hash(data),
+            "size": len(content),
+            **self._summary(data)
+        }
+        base = entries[0] if entries else None
+        entry.update(self._encode(data, content, base, entries))
+        self._save_entries([entry] + entries)
+        self._newest = (unique_name, entry["data_hash"], data)
+        return entry
+
+    def read(self, filename: str) -> Optional[bytes]:
+        """
+        The uncompressed library file of a backup, or None if there is no such
+        backup
+        """
+        entries = self.entries()
+        entry = next((e for e in entries if e["filename"] == filename), None)
+        if entry is None:
+            return None
+        if entry.get("kind", "full") != "delta":
+            return self._read_content(entry)
+        data = self._load_data(entry, entries)
+        return json.dumps(data, indent=2, ensure_ascii=False).encode("utf-8")
+
+    def remove(self, filename: str) -> bool:
+        """Delete a backup, and any object no other backup needs"""
+        entries = self.entries()
+        removed = [entry for entry in entries if entry["filename"] == filename]
+        if not removed:
+            return False
+        remaining = self._without(entries, filename)
+        self._save_entries(remaining)
+        self._collect_garbage(remaining, removed)
+        return True
+
+    def rotate(self, keep: int):
+        """Keep only the newest `keep` backups"""
+        entries = self.entries()
+        if len(entries) <= keep:
+            return
+        removed = entries[keep:]
+        for old in removed[::-1]:
+            entries = self._without(entries, old["filename"])
+        self._save_entries(entries)
+        self._collect_garbage(entries, removed)
+
+    def _without(self, entries: List[Dict[str, Any]],
+                 filename: str) -> List[Dict[str, Any]]:
+        """
+        The entries without the named one. A backup based on it is re-encoded
+        first: against the removed backup's own base if it had one, in full
+        otherwise.
+        """
+        removed = next(entry for entry in entries if entry["filename"] == filename)
+        result = []
+        for entry in entries:
+            if entry is removed:
+                continue
+            if entry.get("base") == filename:
+                data = self._load_data(entry, entries)
+                new_base = next(
+                    (e for e in entries if e["filename"] == removed.get("base")), None
+                )
+                entry = dict(entry)
+                entry.pop("base", None)
+                entry.update(self._encode(data, None, new_base, entries))
+            result.append(entry)
+        if self._newest and self._newest[0] == filename:
+            self._newest = None
+        return result
+
+    def _collect_garbage(self, entries: List[Dict[str, Any]],
+                         removed: List[Dict[str, Any]]):
+        """
+        Delete the legacy files of removed backups, and objects no longer
+        referenced by any backup
+        """
+        for entry in removed:
+            if entry.get("kind") == "file":
+                (self.directory / entry["filename"]).unlink(missing_ok=True)
+        if not self.objects_dir.exists():
+            return
+        referenced = {self._object_name(entry) for entry in entries}
+        for path in self.objects_dir.iterdir():
+            # Names starting with a dot are temp files of a write in progress
+            if not path.name.startswith(".") and path.name not in referenced:
+                path.unlink()
@@ -0,0 +1,59 @@
+"""
+Bounded log of which clusters and standards changed at each library revision
+"""
+import threading
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+from models import Change
+
+
+class ChangeLog:
+    """
+    Remembers the entity changes of recent revisions, so clients can fetch
+    what changed since the revision they last saw instead of everything.
+
+    Only the most recent max_entries changes are kept. Revisions at or
+    before `floor` may be incomplete, so since() cannot answer for them
+    and callers fall back to a full snapshot.
+    """
+
+    def __init__(self, revision: int, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._entries: Deque[Tuple[int, Change]] = deque()
+        self.floor = revision
+        self.revision = revision
+        self._lock = threading.Lock()
+
+    def record(self, revision: int, changes: List[Change]):
+        """Adds the changes that produced the given revision"""
+        with self._lock:
+            self._entries.extend((revision, change) for change in changes)
+            while len(self._entries) > self.max_entries:
+                dropped_revision, _ = self._entries.popleft()
+                self.floor = max(self.floor, dropped_revision)
+            self.revision = revision
+
+    def reset(self, revision: int):
+        """Forgets all history; used when the library was replaced wholesale"""
+        with self._lock:
+            self._entries.clear()
+            self.floor = revision
+            self.revision = revision
+
+    def since(self, revision: int) -> Optional[List[Change]]:
+        """
+        Returns the latest change of every entity changed after the given
+        revision, or None if the log cannot tell (history was dropped, or the
+        revision is unknown to this process).
+        """
+        with self._lock:
+            if revision < self.floor or revision > self.revision:
+                return None
+            latest: Dict[Tuple[str, str], Change] = {}
+            # Entries are in revision order, so walk back until we pass the revision
+            for entry_revision, change in reversed(self._entries):
+                if entry_revision <= revision:
+                    break
+                latest.setdefault((change.entity, change.entity_id), change)
+            return list(reversed(latest.values()))
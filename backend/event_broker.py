@@ -0,0 +1,78 @@
+"""
+In-process publish/subscribe of library change notifications
+"""
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+# An event is a (name, data) pair, e.g.
+# ("change", {"entity": ..., "id": ..., "revision": ...})
+Event = Tuple[str, Dict[str, Any]]
+
+class Subscription:
+    """
+    One client's queue of pending events. When the client falls more than
+    max_pending events behind, the backlog is replaced by a single "resync"
+    event telling it to fetch the current state instead.
+    """
+
+    def __init__(self, broker: "EventBroker", max_pending: int):
+        self._broker = broker
+        self.max_pending = max_pending
+        self._events: Deque[Event] = deque()
+        self._cond = threading.Condition(threading.Lock())
+
+    def offer(self, event: Event):
+        with self._cond:
+            if len(self._events) >= self.max_pending:
+                self._events.clear()
+                self._events.append(("resync", {"revision": event[1].get("revision")}))
+            elif self._events and self._events[-1][0] == "resync":
+                # Everything up to the resync is covered by it; keep its revision
+                # current
+                self._events[-1] = ("resync", {"revision": event[1].get("revision")})
+            else:
+                self._events.append(event)
+            self._cond.notify()
+
+    def get(self, timeout: float) -> Optional[Event]:
+        """Return the next event, or None if none arrived within the timeout"""
+        with self._cond:
+            if not self._events:
+                self._cond.wait(timeout)
+            return self._events.popleft() if self._events else None
+
+    def close(self):
+        self._broker.unsubscribe(self)
+
+class EventBroker:
+    """Fans events out to every subscribed client without ever blocking the publisher"""
+
+    def __init__(self, max_subscribers: int = 16, max_pending: int = 100):
+        self.max_subscribers = max_subscribers
+        self.max_pending = max_pending
+        self._subscriptions: List[Subscription] = []
+        self._lock = threading.Lock()
+
+    def subscribe(self) -> Optional[Subscription]:
+        """Return a new subscription, or None if the subscriber limit is reached"""
+        with self._lock:
+            if len(self._subscriptions) >= self.max_subscribers:
+                return None
+            subscription = Subscription(self, self.max_pending)
+            self._subscriptions.append(subscription)
+            return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            if subscription in self._subscriptions:
+                self._subscriptions.remove(subscription)
+
+    def publish(self, name: str, data: Dict[str, Any]):
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            subscription.offer((name, data))
+
+    def __len__(self) -> int:
+        return len(self._subscriptions)
@@ -1,24 +1,94 @@
 """
 File operations for Standards Library
 """
+import atexit
+import hashlib
+import io
 import json
 import os
 import shutil
-from pathlib import Path
-from typing import Optional, List, Dict, Any
+import signal
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
 from datetime import datetime
-from models import Library, Standard, Cluster, MACVector, MACRationale
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from backup_store import BackupStore
+from models import (
+    Change,
+    Cluster,
+    ClusterIndex,
+    Library,
+    MACRationale,
+    MACVector,
+    Standard,
+)
+from validator import check_duplicate_ids, validate_standard
+
+try:
+    import fcntl
+except ImportError:  # Windows: only in-process locking is available
+    fcntl = None
 
 class FileManager:
     """Manages all file operations for the library"""
+
+    # Uploads are copied to disk in pieces of this many bytes
+    RESTORE_CHUNK_SIZE = 1024 * 1024
     
-    def __init__(self, data_path: str):
+    def __init__(self, data_path: str, checksum: bool = False, journal: bool = False,
+                 write_behind_delay: Optional[float] = None,
+                 write_behind_max_delay: float = 5.0):
         # Directly use the path provided by the controller.
         self.base_dir = Path(data_path)
         self.library_file = self.base_dir / "library.json"
         self.backups_dir = self.base_dir / "backups"
         self.exports_dir = self.base_dir / "exports"
-        self.max_backups = 5
+        # State of background jobs, shared by all worker processes
+        self.jobs_dir = self.base_dir / "jobs"
+        self.lock_file = self.base_dir / "library.lock"
+        self.journal_file = self.base_dir / "library.journal"
+        # Backups are deduplicated and compressed, so many can be kept cheaply
+        self.max_backups = 200
+        # Export files written by export jobs that are kept for download
+        self.max_exports = 20
+        self.backup_store = BackupStore(
+            self.backups_dir, self._atomic_write, self.write_lock
+        )
+        # When enabled, saved libraries end with a "checksum" entry verified on load
+        self.checksum = checksum
+        # When enabled, edits are appended to the journal instead of rewriting
+        # library.json
+        self.journal = journal
+        self.journal_max_bytes = 1024 * 1024
+        self.compact_interval = 60.0
+        self._journal_library: Optional[Library] = None
+        self._compact_requested = threading.Event()
+        self._compactor: Optional[threading.Thread] = None
+
+        # Write-behind mode: full saves are deferred until edits pause for
+        # write_behind_delay seconds, but never by more than write_behind_max_delay.
+        # Deferred data is only visible to this process, so use a single worker.
+        self.write_behind_delay = write_behind_delay
+        self.write_behind_max_delay = write_behind_max_delay
+        self._pending_library: Optional[Library] = None
+        self._dirty_since = 0.0
+        self._last_dirty = 0.0
+        self._flush_now = False
+        self._dirty = threading.Condition()
+        self._saver: Optional[threading.Thread] = None
+        if write_behind_delay is not None:
+            self._install_shutdown_flush()
+
+        # Cross-process write lock state (see write_lock)
+        self._thread_lock = threading.RLock()
+        self._lock_depth = 0
+        self._lock_handle = None
+        # Stat signature of library.json and the journal as of our last load or save
+        self._known_signature: Optional[Tuple] = None
 
     def _ensure_directories(self):
         """Create directory structure if needed"""
@@ -30,30 +100,168 @@ class FileManager:
         """Check if library file exists"""
         return self.library_file.exists() and self.library_file.is_file()
     
+    @contextmanager
+    def write_lock(self):
+        """
+        Exclusive lock on the library shared by all worker processes, so that
+        read-modify-write cycles from different workers never interleave.
+        Reentrant within a thread.
+        """
+        with self._thread_lock:
+            if self._lock_depth == 0:
+                self._ensure_directories()
+                self._lock_handle = open(self.lock_file, 'a')
+                if fcntl:
+                    fcntl.flock(self._lock_handle.fileno(), fcntl.LOCK_EX)
+            self._lock_depth += 1
+            try:
+                yield
+            finally:
+                self._lock_depth -= 1
+                if self._lock_depth == 0:
+                    if fcntl:
+                        fcntl.flock(self._lock_handle.fileno(), fcntl.LOCK_UN)
+                    self._lock_handle.close()
+                    self._lock_handle = None
+
+    @staticmethod
+    def _file_signature(path: Path) -> Optional[Tuple[int, int, int]]:
+        """Cheap change detector for a file: (inode, mtime, size)"""
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            return None
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    def _disk_signature(self) -> Tuple:
+        return (
+            self._file_signature(self.library_file),
+            self._file_signature(self.journal_file)
+        )
+
+    def has_external_changes(self) -> bool:
+        """
+        True if the library on disk changed since this process last loaded or
+        saved it
+        """
+        return self._disk_signature() != self._known_signature
+
+    @contextmanager
+    def _atomic_write(self, path: Path, mode: str = 'w'):
+        """
+        Yields a temp file next to `path`; once the block completes, the data is
+        fsynced and the temp file renamed over `path`. Readers see either the
+        old or the new file, never a partial one. On error the target is left
+        untouched.
+        """
+        fd, tmp_name = tempfile.mkstemp(
+            dir=path.parent, prefix=f".{path.name}.", suffix=".tmp"
+        )
+        try:
+            # mkstemp creates private files; keep the permissions of the file
+            # being replaced
+            os.chmod(tmp_name, path.stat().st_mode & 0o777 if path.exists() else 0o644)
+            encoding = None if 'b' in mode else 'utf-8'
+            with os.fdopen(fd, mode, encoding=encoding) as f:
+                yield f
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_name, path)
+        except BaseException:
+            try:
+                os.unlink(tmp_name)
+            except FileNotFoundError:
+                pass
+            raise
+        self._fsync_directory(path.parent)
+
+    @staticmethod
+    def _fsync_directory(directory: Path):
+        """Persist a rename. Not supported on every platform, so best effort."""
+        try:
+            dir_fd = os.open(directory, os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            os.fsync(dir_fd)
+        except OSError:
+            pass
+        finally:
+            os.close(dir_fd)
+
+    def _atomic_copy(self, source: Path, destination: Path):
+        """Copy a file so that `destination` is replaced atomically"""
+        with open(source, 'rb') as src, self._atomic_write(destination, 'wb') as dst:
+            shutil.copyfileobj(src, dst)
+
+    @staticmethod
+    def _content_checksum(data: dict) -> str:
+        """Checksum over a canonical encoding, so it survives reformatting the file"""
+        canonical = json.dumps(
+            data, sort_keys=True, separators=(",", ":"), ensure_ascii=False
+        )
+        return "sha256:" + hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def _read_library_file(self, path: Path) -> Library:
+        """
+        Parse a library file, verifying its checksum if it has one. Raises on
+        any problem.
+        """
+        with open(path, 'rb') as f:
+            return self._parse_library(f)
+
+    def _parse_library(self, f) -> Library:
+        """Parse a library from an open binary file. Raises on any problem."""
+        return self._dict_to_library(self._parse_library_data(f))
+
+    def _parse_library_data(self, f) -> dict:
+        """Parse the JSON of a library file, verifying its checksum if it has one"""
+        data = json.load(f)
+        if not isinstance(data, dict):
+            raise ValueError("Library file does not contain a JSON object")
+
+        expected = data.pop("checksum", None)
+        if expected is not None and expected != self._content_checksum(data):
+            raise ValueError(
+                "Library checksum mismatch, the file is corrupt or was edited by hand"
+            )
+        return data
+
     def load_library(self) -> Optional[Library]:
         """Load library from JSON file"""
         if not self.library_exists():
             return None
         
+        # Taken before reading, so a write racing with the read is seen next time
+        self._known_signature = self._disk_signature()
         try:
-            with open(self.library_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
-            return self._dict_to_library(data)
+            library = self._read_library_file(self.library_file)
+            self._replay_journal(library)
+            self._journal_library = library
+            return library
         
         except (json.JSONDecodeError, Exception) as e:
             print(f"Error loading library: {e}")
             return None
     
     def save_library(self, library: Library) -> bool:
-        """Save library to JSON file"""
+        """Save library to JSON file atomically. This also compacts the journal."""
         self._ensure_directories()
         try:
             library.last_modified = datetime.now().isoformat()
             data = library.to_dict()
+            if self.checksum:
+                # Added last, so it is the trailing entry of the file
+                data["checksum"] = self._content_checksum(data)
             
-            with open(self.library_file, 'w', encoding='utf-8') as f:
+            with self._atomic_write(self.library_file) as f:
                 json.dump(data, f, indent=2, ensure_ascii=False)
+            # Everything pending or journaled is now part of the snapshot
+            with self._dirty:
+                self._pending_library = None
+            self._discard_journal()
+            self._journal_library = library
+            self._known_signature = self._disk_signature()
             
             return True
         
@@ -61,18 +269,223 @@ class FileManager:
             print(f"Error saving library: {e}")
             return False
 
+    # --- Change Journal ---
+
+    def save_changes(self, library: Library, changes: List[Change]) -> bool:
+        """
+        Persists a committed revision of the library. In journal mode only the
+        touched entities are appended to library.journal; otherwise the whole
+        library is saved, possibly deferred by write-behind mode.
+        library.revision must already be the new revision.
+        """
+        if not self.journal:
+            if self.write_behind_delay is not None:
+                self._mark_dirty(library)
+                return True
+            return self.save_library(library)
+
+        self._ensure_directories()
+        try:
+            library.last_modified = datetime.now().isoformat()
+            record = {
+                "rev": library.revision,
+                "time": library.last_modified,
+                "changes": [
+                    self._change_to_record(library, change) for change in changes
+                ]
+            }
+            line = json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n"
+            with open(self.journal_file, 'a', encoding='utf-8') as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+            self._journal_library = library
+            self._known_signature = self._disk_signature()
+
+            if self.journal_file.stat().st_size >= self.journal_max_bytes:
+                self._compact_requested.set()
+            self._start_compactor()
+            return True
+
+        except Exception as e:
+            print(f"Error appending to library journal: {e}")
+            return False
+
+    def flush(self, library: Optional[Library] = None) -> bool:
+        """
+        Brings library.json up to date (e.g. before a backup or on shutdown):
+        performs a pending write-behind save, or folds journaled changes of
+        `library` into the snapshot.
+        """
+        with self.write_lock():
+            with self._dirty:
+                pending = self._pending_library
+            if pending is not None:
+                return self.save_library(pending)
+            if library is not None and self.journal_file.exists():
+                return self.save_library(library)
+            return True
+
+    @staticmethod
+    def _change_to_record(library: Library, change: Change) -> dict:
+        if change.deleted:
+            return {"op": "delete", "entity": change.entity, "id": change.entity_id}
+        if change.entity == "standard":
+            data = library.standards.get(change.entity_id).to_dict()
+        else:
+            data = library.clusters.get(change.entity_id).to_dict()
+        return {"op": "put", "entity": change.entity, "data": data}
+
+    def _replay_journal(self, library: Library):
+        """
+        Applies journaled revisions newer than the snapshot to a freshly loaded
+        library. A torn final record, left by a crash during an append, is cut
+        off, so the next append starts on a fresh line instead of after it.
+        """
+        if not self.journal_file.exists():
+            return
+
+        # Held so no other worker appends between reading and truncating
+        with self.write_lock():
+            complete_bytes = 0
+            with open(self.journal_file, 'rb') as f:
+                for line in f:
+                    try:
+                        if not line.endswith(b"\n"):
+                            raise ValueError("Record is missing its line end")
+                        record = json.loads(line)
+                    except ValueError:
+                        # A torn final append from a crash; that revision was
+                        # never acknowledged
+                        break
+                    complete_bytes += len(line)
+                    if record["rev"] <= library.revision:
+                        continue  # Already part of the snapshot
+                    for change in record["changes"]:
+                        if change["entity"] == "standard":
+                            if change["op"] == "delete":
+                                library.standards.remove(change["id"])
+                            else:
+                                library.standards.put(self._dict_to_standard(change["data"]))
+                        else:
+                            if change["op"] == "delete":
+                                library.clusters.remove(change["id"])
+                            else:
+                                library.clusters.add(Cluster(**change["data"]))
+                    library.revision = record["rev"]
+                    library.last_modified = record.get("time", library.last_modified)
+
+            if complete_bytes < self.journal_file.stat().st_size:
+                print(f"Discarding torn journal record at byte {complete_bytes}")
+                with open(self.journal_file, 'r+b') as f:
+                    f.truncate(complete_bytes)
+                    f.flush()
+                    os.fsync(f.fileno())
+
+    def _discard_journal(self):
+        try:
+            self.journal_file.unlink()
+        except FileNotFoundError:
+            pass
+
+    def _start_compactor(self):
+        """
+        Starts the background thread that periodically folds the journal into
+        library.json
+        """
+        if self._compactor is None:
+            self._compactor = threading.Thread(
+                target=self._compact_loop, name="journal-compactor", daemon=True
+            )
+            self._compactor.start()
+
+    def _compact_loop(self):
+        while True:
+            self._compact_requested.wait(self.compact_interval)
+            self._compact_requested.clear()
+            with self.write_lock():
+                if not self.journal_file.exists() or self._journal_library is None:
+                    continue
+                if self.has_external_changes():
+                    # Another worker wrote since our last save; our copy may be behind,
+                    # so leave compaction to a process that is up to date.
+                    continue
+                self.save_library(self._journal_library)
+
+    # --- Write-Behind Saving ---
+
+    def _mark_dirty(self, library: Library):
+        """Schedules a deferred save of the library"""
+        now = time.monotonic()
+        with self._dirty:
+            if self._pending_library is None:
+                self._dirty_since = now
+            self._pending_library = library
+            self._last_dirty = now
+            self._dirty.notify()
+        if self._saver is None:
+            self._saver = threading.Thread(
+                target=self._save_loop, name="write-behind-saver", daemon=True
+            )
+            self._saver.start()
+
+    def _save_loop(self):
+        while True:
+            with self._dirty:
+                while self._pending_library is None:
+                    self._dirty.wait()
+                # Debounce: wait for a quiet period, bounded by the maximum delay
+                while self._pending_library is not None and not self._flush_now:
+                    deadline = min(self._last_dirty + self.write_behind_delay,
+                                   self._dirty_since + self.write_behind_max_delay)
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._dirty.wait(remaining)
+                self._flush_now = False
+            self.flush()
+
+    def _install_shutdown_flush(self):
+        """Makes sure deferred saves reach the disk when the process exits"""
+        atexit.register(self.flush)
+        if threading.current_thread() is not threading.main_thread():
+            return  # Signal handlers can only be installed from the main thread
+
+        # Cloud Run and gunicorn stop workers with SIGTERM. Chain to any existing
+        # handler (gunicorn installs its own), waking the saver without taking locks
+        # here; the atexit hook performs the final flush.
+        previous = signal.getsignal(signal.SIGTERM)
+        if previous == signal.SIG_IGN:
+            return
+
+        def on_sigterm(signum, frame):
+            self._flush_now = True
+            if callable(previous):
+                previous(signum, frame)
+            else:
+                raise SystemExit(128 + signum)
+
+        signal.signal(signal.SIGTERM, on_sigterm)
+
+    # --- Backups ---
+
     def create_backup(self) -> Optional[str]:
-        """Create a backup of current library"""
+        """
+        Create a backup of current library. Returns the name of the newest
+        backup, which is an existing one if the library has not changed since.
+        """
         self._ensure_directories()
         if not self.library_exists():
             return None
         
         try:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            backup_file = self.backups_dir / f"library_backup_{timestamp}.json"
-            shutil.copy2(self.library_file, backup_file)
-            self._rotate_backups()
-            return backup_file.name
+            with self.write_lock():
+                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+                entry = self.backup_store.add(
+                    self.library_file.read_bytes(), f"library_backup_{timestamp}.json"
+                )
+                self._rotate_backups()
+            return entry["filename"]
         
         except Exception as e:
             print(f"Error creating backup: {e}")
@@ -80,41 +493,57 @@ class FileManager:
     
     def _rotate_backups(self):
         """Keep only the most recent max_backups backups"""
-        backups = sorted(self.backups_dir.glob("library_backup_*.json"), 
-                        key=lambda p: p.stat().st_mtime, 
-                        reverse=True)
-        
-        for old_backup in backups[self.max_backups:]:
-            old_backup.unlink()
-    
+        self.backup_store.rotate(self.max_backups)
+
+    def rotate_exports(self, pattern: str):
+        """
+        Keep only the most recent max_exports export files matching pattern,
+        which must sort by time
+        """
+        exports = sorted(
+            self.exports_dir.glob(pattern), key=lambda p: p.name, reverse=True
+        )
+        for old_export in exports[self.max_exports:]:
+            # Another thread may be rotating at the same time
+            old_export.unlink(missing_ok=True)
+
     def list_backups(self) -> List[Dict[str, Any]]:
-        """List all available backups with metadata"""
+        """
+        List all available backups with metadata, newest first. Served from
+        the backup manifest, so this does not touch the individual backups.
+        """
         self._ensure_directories()
-        backups = []
-        
-        for backup_file in sorted(self.backups_dir.glob("library_backup_*.json"), 
-                                  key=lambda p: p.stat().st_mtime, 
-                                  reverse=True):
-            stat = backup_file.stat()
-            backups.append({
-                "filename": backup_file.name,
-                "path": str(backup_file),
-                "modified": datetime.fromtimestamp(stat.st_mtime).strftime("%Y-%m-%d %H:%M:%S"),
-                "size": stat.st_size
-            })
-        
-        return backups
+        return [{
+            "filename": entry["filename"],
+            "modified": entry["created"].replace("T", " "),
+            "size": entry["size"],
+            "stored_size": entry["stored_size"],
+            "hash": entry["hash"],
+            "kind": entry.get("kind", "full"),
+            "revision": entry.get("revision"),
+            "standard_count": entry.get("standard_count")
+        } for entry in self.backup_store.entries()]
+
+    def read_backup(self, backup_filename: str) -> Optional[bytes]:
+        """
+        Return the (uncompressed) content of a backup, or None if it does not
+        exist
+        """
+        return self.backup_store.read(backup_filename)
     
     def restore_backup(self, backup_filename: str) -> bool:
-        """Restore library from a backup file"""
+        """Restore library from a backup"""
         self._ensure_directories()
-        backup_path = self.backups_dir / backup_filename
-        
-        if not backup_path.exists():
-            return False
         
         try:
-            shutil.copy2(backup_path, self.library_file)
+            content = self.read_backup(backup_filename)
+            if content is None:
+                return False
+            # Refuse backups that would not load, rather than replacing a good library
+            self._check_restore(io.BytesIO(content))
+            with self._atomic_write(self.library_file, 'wb') as f:
+                f.write(content)
+            self._discard_journal()
             return True
         
         except Exception as e:
@@ -122,18 +551,15 @@ class FileManager:
             return False
     
     def delete_backup_file(self, filename: str) -> bool:
-        """Deletes a specific backup file by its name."""
+        """Deletes a specific backup by its name."""
         self._ensure_directories()
-        backup_path = self.backups_dir / filename
-        
-        # Security check to ensure we are only deleting from the backups directory
-        if backup_path.exists() and backup_path.parent == self.backups_dir:
-            try:
-                backup_path.unlink()
-                return True
-            except Exception as e:
-                print(f"Error deleting backup file {filename}: {e}")
-        return False
+        try:
+            # Only names listed in the manifest can be deleted
+            with self.write_lock():
+                return self.backup_store.remove(filename)
+        except Exception as e:
+            print(f"Error deleting backup {filename}: {e}")
+            return False
 
     def delete_all_backups(self) -> bool:
         """Delete all backup files"""
@@ -148,36 +574,102 @@ class FileManager:
             print(f"Error deleting backups: {e}")
             return False
 
-    def restore_from_file_stream(self, file_stream) -> bool:
-        """Overwrites the main library file with content from a file stream."""
+    def restore_from_file_stream(
+        self, file_stream, progress: Optional[Callable[[int], None]] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Replaces the main library file with an uploaded library.
+
+        The upload is copied to a temp file in chunks, so memory use does not
+        grow with the upload, then parsed and checked from there. Only a file
+        that passes _check_restore is renamed over the current library;
+        otherwise the current library stays untouched and a ValueError says
+        why. Returns restore statistics, or None on an I/O failure.
+        If given, progress is called with the number of bytes copied so far.
+        """
         self._ensure_directories()
         try:
-            # Save the stream content directly to the main library file
-            with open(self.library_file, 'wb') as f:
-                f.write(file_stream.read())
-            return True
+            started = time.perf_counter()
+            size = 0
+            with self._atomic_write(self.library_file, 'w+b') as f:
+                while True:
+                    chunk = file_stream.read(self.RESTORE_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    f.write(chunk)
+                    size += len(chunk)
+                    if progress:
+                        progress(size)
+                received = time.perf_counter()
+                # Raising here discards the temp file and keeps the current library
+                f.seek(0)
+                library, findings = self._check_restore(f)
+                validated = time.perf_counter()
+            self._discard_journal()
+
+            elapsed = time.perf_counter() - started
+            stats = {
+                "bytes": size,
+                "standards": len(library.standards),
+                "clusters": len(library.clusters),
+                **findings,
+                "receive_ms": round((received - started) * 1000, 1),
+                "validate_ms": round((validated - received) * 1000, 1),
+                "total_ms": round(elapsed * 1000, 1),
+                "mb_per_s": round(size / 1e6 / elapsed, 2) if elapsed > 0 else None
+            }
+            return stats
+        except ValueError:
+            raise
         except Exception as e:
             print(f"Error restoring from file stream: {e}")
-            return False
+            return None
+
+    def _check_restore(self, f) -> Tuple[Library, Dict[str, int]]:
+        """
+        Parse a library file about to be restored. Raises ValueError if it is
+        not a library or repeats a cluster or standard ID (see
+        _dict_to_library). Content problems are not a reason to refuse it,
+        since the app itself saves standards that do not validate yet (a new
+        standard has an all-zero MAC vector), so they are only counted.
+        Returns the library and the counts of validation errors and warnings.
+        """
+        try:
+            data = self._parse_library_data(f)
+            lists = (data.get("clusters"), data.get("standards"))
+            if not all(isinstance(value, list) for value in lists):
+                raise ValueError("no 'clusters' and 'standards' lists")
+            library = self._dict_to_library(data)
+        except Exception as e:
+            raise ValueError(f"Not a valid library file: {e}") from e
+
+        cluster_ids = {c.id for c in library.clusters}
+        findings = [
+            finding for std in library.standards
+            for finding in validate_standard(std, cluster_ids)
+        ]
+        errors = sum(finding.severity == "error" for finding in findings)
+        return library, {
+            "validation_errors": errors,
+            "validation_warnings": len(findings) - errors
+        }
     
     def export_library(self, 
                       library: Library, 
                       filename: str,
                       cluster_ids: Optional[List[str]] = None,
                       standard_ids: Optional[List[str]] = None,
-                      include_rationales: bool = False) -> bool:
-        """Export library or subset to file"""
+                      include_rationales: bool = False,
+                      progress: Optional[Callable[[int, int], None]] = None) -> bool:
+        """
+        Export library or subset to file. If given, progress is called with
+        the number of standards converted so far and the total.
+        """
         self._ensure_directories()
         try:
             export_path = self.exports_dir / filename
             
-            filtered_standards = library.standards
-            
-            if cluster_ids:
-                filtered_standards = [s for s in filtered_standards if s.cluster in cluster_ids]
-            
-            if standard_ids:
-                filtered_standards = [s for s in filtered_standards if s.id in standard_ids]
+            filtered_standards = library.select_standards(cluster_ids, standard_ids)
             
             export_data = {
                 "version": library.version,
@@ -192,9 +684,11 @@ class FileManager:
                 if not include_rationales:
                     del std_dict['rationale']
                 standards_as_dicts.append(std_dict)
+                if progress:
+                    progress(len(standards_as_dicts), len(filtered_standards))
             export_data["standards"] = standards_as_dicts
 
-            with open(export_path, 'w', encoding='utf-8') as f:
+            with self._atomic_write(export_path) as f:
                 json.dump(export_data, f, indent=2, ensure_ascii=False)
             
             return True
@@ -204,22 +698,43 @@ class FileManager:
             return False
     
     def _dict_to_library(self, data: dict) -> Library:
-        """Convert dictionary to Library object"""
+        """
+        Convert dictionary to Library object. Raises ValueError for repeated
+        cluster or standard IDs: the library keeps one entity per ID, so the
+        extra copies would otherwise vanish, and for good once it is saved.
+        """
+        # Checked on the raw data, before the indexes collapse duplicates
+        duplicates = check_duplicate_ids(s.get("id") for s in data.get("standards", []))
+        duplicates += check_duplicate_ids(
+            (c.get("id") for c in data.get("clusters", [])), "cluster"
+        )
+        if duplicates:
+            shown = "; ".join(f"[{e.standard_id}] {e.message}" for e in duplicates[:5])
+            more = f" (and {len(duplicates) - 5} more)" if len(duplicates) > 5 else ""
+            raise ValueError(
+                f"Library has {len(duplicates)} duplicate ID(s): {shown}{more}"
+            )
+
         library = Library(
             version=data.get("version", "2.7"),
-            last_modified=data.get("last_modified", "")
+            last_modified=data.get("last_modified", ""),
+            revision=data.get("revision", 0)
         )
         
-        library.clusters = [Cluster(**c) for c in data.get("clusters", [])]
+        library.clusters = ClusterIndex(Cluster(**c) for c in data.get("clusters", []))
         
         for std_data in data.get("standards", []):
-            mac_vector = MACVector(**std_data.get("mac_vector", {}))
-            rationale = MACRationale(**std_data.get("rationale", {}))
-            std_data["mac_vector"] = mac_vector
-            std_data["rationale"] = rationale
-            library.standards.append(Standard(**std_data))
+            library.standards.put(self._dict_to_standard(std_data))
         
         return library
+
+    @staticmethod
+    def _dict_to_standard(std_data: dict) -> Standard:
+        """Convert dictionary to Standard object"""
+        std_data = dict(std_data)
+        std_data["mac_vector"] = MACVector(**std_data.get("mac_vector", {}))
+        std_data["rationale"] = MACRationale(**std_data.get("rationale", {}))
+        return Standard(**std_data)
     
     def create_empty_library(self) -> Library:
         """Create a new empty library with default structure"""
@@ -243,5 +758,5 @@ class FileManager:
             Cluster("ES", "Existential Stewardship", "Standards representing apex of moral responsibility...", 15)
         ]
         
-        library.clusters = default_clusters
+        library.clusters = ClusterIndex(default_clusters)
         return library
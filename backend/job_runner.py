@@ -0,0 +1,201 @@
+"""
+Background execution of slow operations (backups, exports, restores)
+"""
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+
+class Job:
+    """One submitted operation, with the progress it reports while running"""
+
+    # Progress is saved at most this often, in seconds
+    SAVE_INTERVAL = 0.5
+
+    def __init__(self, kind: str, on_update: Optional[Callable[["Job"], None]] = None):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.status = "queued"  # "queued", "running", "succeeded" or "failed"
+        self.done = 0
+        self.total: Optional[int] = None
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.created = datetime.now()
+        self.started: Optional[datetime] = None
+        self.finished: Optional[datetime] = None
+        # Called whenever the job's state should be saved
+        self._on_update = on_update
+        self._last_update = 0.0
+
+    def progress(self, done: int, total: Optional[int] = None):
+        """
+        Called by the running operation to report how far it got, in units of
+        its choice
+        """
+        self.done = done
+        if total is not None:
+            self.total = total
+        now = time.monotonic()
+        if now - self._last_update >= self.SAVE_INTERVAL:
+            self._last_update = now
+            self.updated()
+
+    def updated(self):
+        if self._on_update:
+            self._on_update(self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {
+            "id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "progress": {"done": self.done, "total": self.total},
+            "created": self.created.isoformat(timespec="seconds")
+        }
+        if self.started:
+            data["started"] = self.started.isoformat(timespec="seconds")
+        if self.finished:
+            data["finished"] = self.finished.isoformat(timespec="seconds")
+            duration = self.finished - self.started
+            data["duration_ms"] = round(duration.total_seconds() * 1000, 1)
+        if self.status == "succeeded":
+            data["result"] = self.result
+        if self.status == "failed":
+            data["error"] = self.error
+        return data
+
+class JobRunner:
+    """
+    Runs operations on a small thread pool so requests can return at once.
+
+    At most max_pending jobs may be queued or running; submit() refuses more
+    rather than letting the queue grow without bound. The most recent
+    max_finished finished jobs are kept so clients can collect their results.
+
+    Jobs run in the process that accepted them. If a directory is given, each
+    job's state is also saved there as <id>.json, so any worker process can
+    report on it. Records older than max_age seconds are removed on start.
+    """
+
+    def __init__(self, directory: Optional[Path] = None, max_workers: int = 2,
+                 max_pending: int = 16, max_finished: int = 100,
+                 max_age: float = 24 * 3600):
+        self.directory = Path(directory) if directory is not None else None
+        self.max_pending = max_pending
+        self.max_finished = max_finished
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="job"
+        )
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._pending = 0
+        self._lock = threading.Lock()
+        if self.directory is not None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self._remove_stale_records(max_age)
+
+    def submit(self, kind: str, operation: Callable[[Job], Any]) -> Optional[Job]:
+        """
+        Queue operation(job), whose return value becomes the job's result.
+        Returns the job, or None if too many jobs are pending.
+        """
+        with self._lock:
+            if self._pending >= self.max_pending:
+                return None
+            self._pending += 1
+            job = Job(kind, self._save if self.directory is not None else None)
+            self._jobs[job.id] = job
+            self._forget_finished()
+        job.updated()
+        self._executor.submit(self._run, job, operation)
+        return job
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """State of a job as in Job.to_dict(), whichever worker process runs it"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is not None:
+            return job.to_dict()
+        path = self._record_path(job_id)
+        if path is None:
+            return None
+        try:
+            with open(path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _record_path(self, job_id: str) -> Optional[Path]:
+        if self.directory is None or not job_id.isalnum():
+            return None
+        return self.directory / f"{job_id}.json"
+
+    def _save(self, job: Job):
+        """Atomically replace the job's record, so readers never see a partial file"""
+        try:
+            fd, tmp_name = tempfile.mkstemp(
+                dir=self.directory, prefix=f".{job.id}.", suffix=".tmp"
+            )
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(job.to_dict(), f)
+            os.replace(tmp_name, self._record_path(job.id))
+        except (OSError, TypeError, ValueError) as e:
+            # The job itself carries on; only other workers miss the update
+            print(f"Error saving {job.kind} job {job.id}: {e}")
+
+    def _remove_record(self, job_id: str):
+        try:
+            os.unlink(self._record_path(job_id))
+        except OSError:
+            pass
+
+    def _remove_stale_records(self, max_age: float):
+        """
+        Delete records (and leftover temp files) of jobs created long ago,
+        including by past processes
+        """
+        cutoff = time.time() - max_age
+        for path in self.directory.iterdir():
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink()
+            except OSError:
+                pass
+
+    def _run(self, job: Job, operation: Callable[[Job], Any]):
+        job.started = datetime.now()
+        job.status = "running"
+        job.updated()
+        try:
+            job.result = operation(job)
+            if job.total is None:
+                # Operations that report no progress count as a single step
+                job.progress(1, 1)
+            job.status = "succeeded"
+        except Exception as e:
+            print(f"Error in {job.kind} job {job.id}: {e}")
+            job.error = str(e)
+            job.status = "failed"
+        finally:
+            job.finished = datetime.now()
+            job.updated()
+            with self._lock:
+                self._pending -= 1
+
+    def _forget_finished(self):
+        """
+        Drop the oldest finished jobs beyond max_finished. Called with the lock
+        held.
+        """
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(finished) - self.max_finished)]:
+            del self._jobs[job_id]
+            if self.directory is not None:
+                self._remove_record(job_id)
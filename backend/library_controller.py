@@ -3,23 +3,121 @@
 LibraryController: The business logic core for the Standards Library.
 This class is independent of any UI framework.
 """
-import os
+import base64
+import hashlib
 import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from bisect import bisect_left, bisect_right
+from dataclasses import replace
 from datetime import datetime
-from typing import Optional, Dict, Any
+from functools import wraps
+from operator import attrgetter
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
 
-from models import Library, Standard, Cluster, MACVector, MACRationale
+from change_log import ChangeLog
+from event_broker import EventBroker
 from file_operations import FileManager
+from job_runner import Job, JobRunner
+from lru_cache import LRUCache
+from mac_store import MACStore, as_matrix, as_vector
+from models import (
+    STANDARD_FIELDS,
+    Change,
+    Cluster,
+    ClusterIndex,
+    Library,
+    MACRationale,
+    MACVector,
+    Standard,
+)
+from rwlock import ReadWriteLock
+from search_index import SearchIndex
+from validator import ValidationState
+
+
+def _reads(method):
+    """
+    Runs a read-only controller method against the latest library on disk,
+    under the shared read lock so it can run alongside other reads.
+    """
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        self._sync_with_disk()
+        with self._lock.read_locked():
+            return method(self, *args, **kwargs)
+    return wrapper
+
+def _writes(method):
+    """
+    Runs a mutating controller method under the exclusive in-process and
+    cross-worker write locks, after catching up with any change another
+    worker has saved.
+    """
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock.write_locked(), self.file_manager.write_lock():
+            self._sync_with_disk()
+            return method(self, *args, **kwargs)
+    return wrapper
 
 class LibraryController:
     """Handles all business logic for managing the library."""
 
+    # Standards serialized per chunk by streaming exports
+    EXPORT_STREAM_BATCH = 200
+    # Largest page of standards one request may ask for
+    MAX_PAGE_SIZE = 1000
+    # Orders get_standards_page can sort by
+    STANDARD_SORT_KEYS = ("id", "cluster", "importance_weight", "date_modified")
+
     def __init__(self):
         # Use an environment variable for the data path for robustness in containers.
         # Default to the local relative path if the variable isn't set.
         data_path = os.getenv("DATA_PATH", "standards_library")
-        self.file_manager = FileManager(data_path)
-        self.library: Optional[Library] = self._load_initial_library()
+        checksum = os.getenv("LIBRARY_CHECKSUM", "").lower() in ("1", "true", "yes")
+        journal = os.getenv("LIBRARY_JOURNAL", "").lower() in ("1", "true", "yes")
+        write_behind = os.getenv("LIBRARY_WRITE_BEHIND")
+        self.file_manager = FileManager(
+            data_path,
+            checksum=checksum,
+            journal=journal,
+            write_behind_delay=float(write_behind) if write_behind else None,
+            write_behind_max_delay=float(os.getenv("LIBRARY_WRITE_BEHIND_MAX", "5"))
+        )
+        # Cached payloads are only valid for the library revision they were built from.
+        self._payload_cache: Dict[str, Tuple[int, bytes, str]] = {}
+        # Export results keyed by (revision, normalized export options)
+        self._export_cache = LRUCache(max_size=32)
+        # Standards sorted by each sort key, keyed by (revision, sort key)
+        self._sort_cache = LRUCache(max_size=8)
+        # Guards self.library between request threads. Always taken before
+        # the file manager's write lock.
+        self._lock = ReadWriteLock()
+        with self.file_manager.write_lock():
+            self.library: Optional[Library] = self._load_initial_library()
+        # Columnar MAC data of all standards, kept in step with every commit
+        self.mac_store = MACStore.from_library(self.library)
+        # Validation findings per standard, likewise updated per commit
+        self.validation = ValidationState(self.library)
+        # Full-text index over the standards' text, likewise updated per commit
+        self.search_index = SearchIndex(self.library)
+        # Which entities changed at each recent revision, for delta syncs
+        self.change_log = ChangeLog(self.revision)
+        # Pushes a notification per committed change to connected clients
+        max_subscribers = int(os.getenv("LIBRARY_EVENTS_MAX_CLIENTS", "16"))
+        self.events = EventBroker(max_subscribers=max_subscribers)
+        # Runs backups, exports and restores in the background when a client asks for it
+        self.jobs = JobRunner(self.file_manager.jobs_dir)
+
+    @property
+    def revision(self) -> int:
+        """The revision of the library currently held in memory."""
+        return self.library.revision
 
     def _load_initial_library(self) -> Library:
         """Loads the library from disk or creates a new one."""
@@ -27,16 +125,219 @@ class LibraryController:
             library = self.file_manager.load_library()
             if library:
                 return library
+            # Never replace a file we could not read: it may hold the only copy of
+            # the data.
+            raise Exception(
+                f"Library file '{self.file_manager.library_file}' exists but could "
+                "not be loaded."
+            )
         
-        # If no library exists or loading fails, create and save an empty one.
+        # If no library exists, create and save an empty one.
         empty_library = self.file_manager.create_empty_library()
         self.file_manager.save_library(empty_library)
         return empty_library
 
+    def _sync_with_disk(self):
+        """
+        Reloads the library if another worker has saved a different revision.
+        This costs a single stat() call when nothing has changed. Must not be
+        called while holding the read lock.
+        """
+        if not self.file_manager.has_external_changes():
+            return
+        with self._lock.write_locked(), self.file_manager.write_lock():
+            if not self.file_manager.has_external_changes():
+                return  # Another thread already caught up
+            library = self.file_manager.load_library()
+            if library and library.revision != self.library.revision:
+                self._set_library(library, self._changes_to(library))
+
+    def _commit(self, changes: List[Change]):
+        """
+        Stamps the next revision on the library, persists the given changes,
+        and invalidates everything derived from the previous revision.
+        """
+        self.library.revision += 1
+        self.file_manager.save_changes(self.library, changes)
+        self.mac_store.apply(self.library, changes)
+        self.validation.apply(self.library, changes)
+        self.search_index.apply(self.library, changes)
+        self.change_log.record(self.revision, changes)
+        self._invalidate_caches()
+        self._publish_changes(changes)
+
+    def _set_library(self, library: Library, changes: Optional[List[Change]] = None):
+        """
+        Swaps in a new in-memory library that is already saved. If the changes
+        from the current library are known, derived state is updated for those
+        only; otherwise it is rebuilt.
+        """
+        self.library = library
+        if changes is None:
+            self.mac_store = MACStore.from_library(library)
+            self.validation.rebuild(library)
+            self.search_index.rebuild(library)
+            self.change_log.reset(library.revision)
+        else:
+            self.mac_store.apply(library, changes)
+            self.validation.apply(library, changes)
+            self.search_index.apply(library, changes)
+            self.change_log.record(library.revision, changes)
+        self._invalidate_caches()
+        self._publish_changes(changes)
+
+    def _publish_changes(self, changes: Optional[List[Change]]):
+        """
+        Notifies subscribers of each change at the current revision. Unknown
+        or very large sets of changes are announced as a single resync.
+        """
+        if changes is None or len(changes) > self.events.max_pending:
+            self.events.publish("resync", {"revision": self.revision})
+            return
+        for change in changes:
+            data = {
+                "entity": change.entity,
+                "id": change.entity_id,
+                "revision": self.revision
+            }
+            if change.deleted:
+                data["deleted"] = True
+            self.events.publish("change", data)
+
+    def refresh(self):
+        """
+        Catches up with changes saved by other workers, publishing them to
+        subscribers.
+        """
+        self._sync_with_disk()
+
+    def _changes_to(self, library: Library) -> List[Change]:
+        """
+        Lists the clusters and standards that differ between the live library
+        and another one (a staged import, a restore, or a newer copy on disk).
+        """
+        changes = []
+        indexes = (
+            ("cluster", self.library.clusters, library.clusters),
+            ("standard", self.library.standards, library.standards)
+        )
+        for entity, current, other in indexes:
+            for item in other:
+                existing = current.get(item.id)
+                # Items shared with the live library (as in staged imports) are
+                # unchanged
+                if existing is not item and existing != item:
+                    changes.append(Change(entity, item.id))
+            changes.extend(
+                Change(entity, item.id, deleted=True)
+                for item in current if item.id not in other
+            )
+        return changes
+
+    def _invalidate_caches(self):
+        self._payload_cache.clear()
+        self._export_cache.clear()
+        self._sort_cache.clear()
+
+    def _adopt_library(self, library: Library):
+        """
+        Makes a restored library live and saves it. The restored data may carry
+        an older revision, so it is renumbered to keep revisions increasing.
+        """
+        library.revision = max(library.revision, self.library.revision) + 1
+        self.file_manager.save_library(library)
+        self._set_library(library, self._changes_to(library))
+
+    def _cached_payload(self, key: str, build: Callable[[], Any]) -> Tuple[bytes, str]:
+        """
+        Returns the JSON-encoded result of build() and its ETag, serializing
+        at most once per library revision.
+        """
+        cached = self._payload_cache.get(key)
+        if cached and cached[0] == self.revision:
+            return cached[1], cached[2]
+
+        revision = self.revision
+        body = json.dumps(
+            build(), ensure_ascii=False, separators=(",", ":")
+        ).encode("utf-8")
+        # Content-based, so every worker computes the same tag for the same data
+        etag = hashlib.sha1(body).hexdigest()
+        self._payload_cache[key] = (revision, body, etag)
+        return body, etag
+
+    @_reads
+    def get_standards_payload(self) -> Tuple[bytes, str]:
+        """Returns all standards as pre-serialized JSON bytes, with an ETag."""
+        return self._cached_payload(
+            "standards", lambda: [std.to_dict() for std in self.library.standards]
+        )
+
+    @_reads
+    def get_clusters_payload(self) -> Tuple[bytes, str]:
+        """Returns all clusters as pre-serialized JSON bytes, with an ETag."""
+        return self._cached_payload(
+            "clusters", lambda: [c.to_dict() for c in self.library.clusters]
+        )
+
+    @_reads
+    def get_validation_payload(self) -> Tuple[bytes, str]:
+        """
+        Returns the current validation report as pre-serialized JSON bytes,
+        with an ETag.
+        """
+        def build() -> Dict[str, Any]:
+            return {"revision": self.revision, **self.validation.report()}
+
+        return self._cached_payload("validation", build)
+
+    @_reads
+    def get_changes_since(self, since: Optional[int]) -> Dict[str, Any]:
+        """
+        Returns the clusters and standards upserted or deleted after the given
+        revision, each entity once in its current state. If the change log no
+        longer covers that revision (or none is given), returns every cluster
+        and standard with "full" set, and the client should replace its copy.
+        """
+        changes = self.change_log.since(since) if since is not None else None
+        if changes is None:
+            return {
+                "revision": self.revision,
+                "full": True,
+                "clusters": {
+                    "upserted": [c.to_dict() for c in self.library.clusters],
+                    "deleted": []
+                },
+                "standards": {
+                    "upserted": [std.to_dict() for std in self.library.standards],
+                    "deleted": []
+                }
+            }
+
+        result = {
+            "revision": self.revision,
+            "full": False,
+            "clusters": {"upserted": [], "deleted": []},
+            "standards": {"upserted": [], "deleted": []}
+        }
+        for change in changes:
+            if change.entity == "cluster":
+                index, bucket = self.library.clusters, result["clusters"]
+            else:
+                index, bucket = self.library.standards, result["standards"]
+            item = index.get(change.entity_id)
+            if item is None:
+                bucket["deleted"].append(change.entity_id)
+            else:
+                bucket["upserted"].append(item.to_dict())
+        return result
+
+    @_reads
     def get_library_version(self) -> str:
         """Returns the version of the current library."""
         return self.library.version if self.library else "N/A"
 
+    @_reads
     def get_all_standards(self) -> list[dict]:
         """
         Returns a list of all standards, converted to dictionaries for JSON serialization.
@@ -45,6 +346,110 @@ class LibraryController:
             return []
         return [std.to_dict() for std in self.library.standards]
 
+    @_reads
+    def get_standards_page(self, limit: Optional[int] = None,
+                           cursor: Optional[str] = None, sort: str = "id",
+                           fields: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        Returns one page of standards, sorted by "id", "cluster" (cluster order),
+        "importance_weight" or "date_modified", descending if prefixed with "-",
+        with ties broken by ID. Only the requested fields are serialized.
+
+        Pass the returned "next_cursor" back to get the following page; it is
+        None on the last page. Cursors point between two sort positions rather
+        than at an offset, so a page never repeats or skips standards that were
+        not themselves changed in the meantime.
+        """
+        descending = sort.startswith("-")
+        sort_key = sort.lstrip("-")
+        if sort_key not in self.STANDARD_SORT_KEYS:
+            raise ValueError(
+                f"Cannot sort by '{sort}'. "
+                f"Use one of: {', '.join(self.STANDARD_SORT_KEYS)}."
+            )
+        if fields is not None:
+            unknown = [name for name in fields if name not in STANDARD_FIELDS]
+            if unknown:
+                raise ValueError(f"Unknown field(s): {', '.join(unknown)}")
+        if limit is None:
+            limit = self.MAX_PAGE_SIZE
+        else:
+            try:
+                limit = int(limit)
+            except (TypeError, ValueError):
+                raise ValueError("'limit' must be an integer.")
+            if not 1 <= limit <= self.MAX_PAGE_SIZE:
+                raise ValueError(f"'limit' must be between 1 and {self.MAX_PAGE_SIZE}.")
+
+        keys, standards = self._sorted_standards(sort_key)
+        try:
+            after = self._decode_cursor(cursor, sort) if cursor else None
+            if descending:
+                end = bisect_left(keys, after) if after is not None else len(keys)
+                start = max(0, end - limit)
+                page = standards[start:end][::-1]
+                more = start > 0
+            else:
+                start = bisect_right(keys, after) if after is not None else 0
+                end = start + limit
+                page = standards[start:end]
+                more = end < len(keys)
+        except TypeError:
+            # The cursor holds a key of the wrong type for this sort
+            raise ValueError("Invalid cursor.")
+
+        next_cursor = None
+        if more and page:
+            last = start if descending else end - 1
+            next_cursor = self._encode_cursor(sort, keys[last])
+        return {
+            "standards": [std.to_dict(fields) for std in page],
+            "total": len(keys),
+            "next_cursor": next_cursor
+        }
+
+    def _sorted_standards(self, sort_key: str) -> Tuple[List[tuple], List[Standard]]:
+        """
+        Returns the sort keys and standards in ascending order, computed once
+        per revision.
+        """
+        cache_key = (self.revision, sort_key)
+        cached = self._sort_cache.get(cache_key)
+        if cached is None:
+            if sort_key == "cluster":
+                orders = {c.id: c.order for c in self.library.clusters}
+
+                def key_of(std: Standard) -> int:
+                    # Standards of unknown clusters sort last
+                    return orders.get(std.cluster, sys.maxsize)
+            else:
+                key_of = attrgetter(sort_key)
+            # Pairing each key with the (unique) ID makes every key distinct
+            pairs = sorted(
+                ((key_of(std), std.id), std) for std in self.library.standards
+            )
+            cached = ([key for key, _ in pairs], [std for _, std in pairs])
+            self._sort_cache.put(cache_key, cached)
+        return cached
+
+    @staticmethod
+    def _encode_cursor(sort: str, key: tuple) -> str:
+        raw = json.dumps({"sort": sort, "after": list(key)}, separators=(",", ":"))
+        return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+    @staticmethod
+    def _decode_cursor(cursor: str, sort: str) -> tuple:
+        try:
+            data = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+            after = tuple(data["after"])
+            cursor_sort = data["sort"]
+        except (ValueError, TypeError, KeyError, UnicodeEncodeError):
+            raise ValueError("Invalid cursor.")
+        if cursor_sort != sort or len(after) != 2:
+            raise ValueError("The cursor belongs to a different sort order.")
+        return after
+
+    @_reads
     def get_all_clusters(self) -> list[dict]:
         """
         Returns a list of all clusters, converted to dictionaries.
@@ -53,6 +458,7 @@ class LibraryController:
             return []
         return [cluster.to_dict() for cluster in self.library.clusters]
 
+    @_writes
     def create_standard(self, data: Dict[str, Any]) -> Dict[str, Any]:
         """
         Creates a new standard, adds it to the library, and saves the file.
@@ -60,22 +466,41 @@ class LibraryController:
         if not self.library:
             # This should ideally not happen if the controller is initialized properly
             raise Exception("Library not loaded. Cannot create standard.")
-        
+
         standard_id = data.get("id")
         if not standard_id:
             raise ValueError("Standard ID is a required field.")
 
         # --- Validation: Check for uniqueness ---
-        existing_ids = {std['id'] for std in self.get_all_standards()}
-        if standard_id in existing_ids:
+        if standard_id in self.library.standards:
             raise ValueError(f"Standard ID '{standard_id}' already exists. Please choose a unique ID.")
 
+        new_standard = self._build_standard(data)
+
+        # Add the new standard to the library's index of standards
+        self.library.standards.put(new_standard)
+
+        # Save the updated library back to the JSON file
+        self._commit([Change("standard", standard_id)])
+
+        # Return the new standard's data so the frontend can confirm creation
+        return new_standard.to_dict()
+
+    def _build_standard(self, data: Dict[str, Any]) -> Standard:
+        """
+        Returns a new Standard object for the given data without adding it
+        to the library. The caller is responsible for checking ID uniqueness.
+        """
+        standard_id = data.get("id")
+        if not standard_id:
+            raise ValueError("Standard ID is a required field.")
+
         cluster_id = data.get("cluster")
         if not cluster_id:
             raise ValueError("Cluster ID is required to create a standard.")
             
         # Create a new Standard object from the incoming data
-        new_standard = Standard(
+        return Standard(
             id=standard_id,
             name=data.get("name", ""),
             description=data.get("description", ""),
@@ -98,25 +523,31 @@ class LibraryController:
             date_created=datetime.now().strftime("%Y-%m-%d"),
             date_modified=datetime.now().strftime("%Y-%m-%d")
         )
-        
-        # Add the new standard to the library's main list of standards
-        self.library.standards.append(new_standard)
-        
-        # Save the updated library back to the JSON file
-        self.file_manager.save_library(self.library)
-
-        # Return the new standard's data so the frontend can confirm creation
-        return new_standard.to_dict()
 
+    @_writes
     def update_standard(self, standard_id: str, form_data: Dict[str, Any]) -> Dict[str, Any]:
         """
         Finds a standard by its ID, validates the incoming data,
         updates the standard, saves the library, and returns the updated standard.
         """
-        std = next((s for s in self.library.standards if s.id == standard_id), None)
-        if not std:
+        existing = self.library.standards.get(standard_id)
+        if not existing:
             raise ValueError(f"Could not find standard {standard_id} to save.")
 
+        # Update a copy, so snapshots held by streaming exports never change under them
+        std = replace(existing)
+        self._apply_standard_update(std, form_data)
+        self.library.standards.put(std)
+
+        self._commit([Change("standard", standard_id)])
+        return std.to_dict()
+
+    def _apply_standard_update(self, std: Standard, form_data: Dict[str, Any]):
+        """
+        Validates the incoming data and applies it to the given standard object.
+        Nothing is modified if validation fails. The caller must put() the
+        standard back into its library so the cluster index stays current.
+        """
         # --- Validation ---
         # Pydantic will validate the structure of mac_vector and rationale upon object creation
         new_mac_vector = MACVector(**form_data.get("mac_vector", {}))
@@ -139,28 +570,27 @@ class LibraryController:
         std.rationale = MACRationale(**form_data.get("rationale", {}))
         std.date_modified = datetime.now().strftime("%Y-%m-%d")
 
-        self.file_manager.save_library(self.library)
-        return std.to_dict()
-
+    @_writes
     def delete_standard(self, standard_id: str) -> bool:
         """
         Finds a standard by its ID and removes it from the library.
         Returns True on success, False if the standard was not found.
         """
-        initial_length = len(self.library.standards)
-        self.library.standards = [s for s in self.library.standards if s.id != standard_id]
-        
-        if len(self.library.standards) < initial_length:
-            self.file_manager.save_library(self.library)
+        if self.library.standards.remove(standard_id) is not None:
+            self._commit([Change("standard", standard_id, deleted=True)])
             return True
         
         return False
 
+    @_writes
     def create_backup(self) -> str:
         """
         Delegates the creation of a timestamped backup to the FileManager.
         Returns the filename of the created backup file.
         """
+        # Backups copy library.json, so it must include any deferred or journaled
+        # changes
+        self.file_manager.flush(self.library)
         backup_filename = self.file_manager.create_backup()
         if backup_filename:
             return backup_filename
@@ -171,79 +601,406 @@ class LibraryController:
         backups = self.file_manager.list_backups()
         return [b['filename'] for b in backups]
 
+    def get_backup_content(self, filename: str) -> Optional[bytes]:
+        """
+        Returns the content of a backup as library JSON, or None if there is no
+        such backup.
+        """
+        return self.file_manager.read_backup(filename)
+
     def delete_backup_file(self, filename: str) -> bool:
         """Delegates the deletion of a specific backup file to the FileManager."""
         return self.file_manager.delete_backup_file(filename)
 
-    def restore_from_file(self, file_stream) -> bool:
+    @_writes
+    def restore_from_file(
+        self, file_stream, progress: Optional[Callable[[int], None]] = None
+    ) -> Optional[Dict[str, Any]]:
         """
         Overwrites the main library with the content from an uploaded file stream.
+        Raises ValueError if the upload is not a valid library, in which case
+        nothing changes. Returns restore statistics, or None on failure.
         """
         # DELEGATE to the FileManager.
-        if self.file_manager.restore_from_file_stream(file_stream):
-            self.library = self._load_initial_library() # Reload the library in memory
-            return True
-        return False
+        stats = self.file_manager.restore_from_file_stream(file_stream, progress)
+        if stats is not None:
+            # Reload the library in memory
+            self._adopt_library(self._load_initial_library())
+        return stats
 
+    @_writes
     def restore_from_backup(self, filename: str) -> bool:
         """
         Restores the library from a specific backup filename on the server.
         """
         if self.file_manager.restore_backup(filename):
-            self.library = self._load_initial_library() # Reload the library in memory
+            # Reload the library in memory
+            self._adopt_library(self._load_initial_library())
             return True
         return False
 
+    @_reads
     def get_exported_data(self, export_options: Dict[str, Any]) -> Dict[str, Any]:
         """
         Applies filters to the current library in memory and returns the
         resulting data as a dictionary, ready for export.
+
+        Results are cached per library revision and set of options, so repeated
+        exports of an unchanged library skip filtering and serialization. The
+        returned lists are shared with the cache and must not be modified.
         """
         if not self.library:
             raise ValueError("Library not loaded.")
 
-        filtered_standards = self.library.standards
-
-        if export_options.get("cluster_ids"):
-            filtered_standards = [s for s in filtered_standards if s.cluster in export_options["cluster_ids"]]
-        
-        if export_options.get("standard_ids"):
-            filtered_standards = [s for s in filtered_standards if s.id in export_options["standard_ids"]]
-
-        standards_as_dicts = []
-        for std in filtered_standards:
-            std_dict = std.to_dict()
-            if not export_options.get("include_rationales", True):
-                del std_dict['rationale']
-            standards_as_dicts.append(std_dict)
+        cache_key = (self.revision, self._export_options_key(export_options))
+        cached = self._export_cache.get(cache_key)
+        if cached is None:
+            standards_as_dicts = []
+            for std in self._filter_standards(export_options):
+                std_dict = std.to_dict()
+                if not export_options.get("include_rationales", True):
+                    del std_dict['rationale']
+                standards_as_dicts.append(std_dict)
+            cached = ([c.to_dict() for c in self.library.clusters], standards_as_dicts)
+            self._export_cache.put(cache_key, cached)
 
+        clusters_as_dicts, standards_as_dicts = cached
         return {
             "version": self.library.version,
             "exported": datetime.now().isoformat(),
-            "clusters": [c.to_dict() for c in self.library.clusters],
+            "clusters": clusters_as_dicts,
             "standards": standards_as_dicts
         }
 
+    @staticmethod
+    def _export_options_key(export_options: Dict[str, Any]) -> tuple:
+        """Normalizes export options so equivalent requests share a cache entry."""
+        return (
+            tuple(sorted(set(export_options.get("cluster_ids") or ()))),
+            tuple(sorted(set(export_options.get("standard_ids") or ()))),
+            bool(export_options.get("include_rationales", True))
+        )
+
+    def _filter_standards(self, export_options: Dict[str, Any]) -> List[Standard]:
+        """Returns the standards selected by the export options, in library order."""
+        return self.library.select_standards(
+            export_options.get("cluster_ids"), export_options.get("standard_ids")
+        )
+
+    @_reads
+    def stream_exported_data(self, export_options: Dict[str, Any],
+                             ndjson: bool = True) -> Iterator[str]:
+        """
+        Returns a generator producing the same export as get_exported_data in
+        text chunks, serializing one standard at a time.
+
+        With ndjson=True each line is one record: a {"type": "library"} header,
+        then {"type": "cluster"} and {"type": "standard"} records carrying the
+        entity under "data". Otherwise the chunks form the regular export
+        document.
+
+        The selection is captured now, under the read lock, and the generator
+        runs without holding it. Standards are never modified in place, so later
+        edits cannot leak into an export that is still streaming.
+        """
+        if not self.library:
+            raise ValueError("Library not loaded.")
+
+        header = {
+            "version": self.library.version, "exported": datetime.now().isoformat()
+        }
+        clusters = [c.to_dict() for c in self.library.clusters]
+        standards = self._filter_standards(export_options)
+        include_rationales = export_options.get("include_rationales", True)
+
+        def encode(data: Dict[str, Any]) -> str:
+            return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+        def standard_dicts() -> Iterator[Dict[str, Any]]:
+            for std in standards:
+                std_dict = std.to_dict()
+                if not include_rationales:
+                    del std_dict['rationale']
+                yield std_dict
+
+        def ndjson_chunks() -> Iterator[str]:
+            yield encode(dict(header, type="library")) + "\n"
+            yield "".join(
+                encode({"type": "cluster", "data": c}) + "\n" for c in clusters
+            )
+            batch = []
+            for std_dict in standard_dicts():
+                batch.append(encode({"type": "standard", "data": std_dict}) + "\n")
+                if len(batch) == self.EXPORT_STREAM_BATCH:
+                    yield "".join(batch)
+                    batch = []
+            if batch:
+                yield "".join(batch)
+
+        def json_chunks() -> Iterator[str]:
+            # The header is encoded as an object and reopened to append the lists
+            yield (
+                encode(header)[:-1] + ',"clusters":' + encode(clusters)
+                + ',"standards":['
+            )
+            batch = []
+            for i, std_dict in enumerate(standard_dicts()):
+                batch.append(("," if i else "") + encode(std_dict))
+                if len(batch) == self.EXPORT_STREAM_BATCH:
+                    yield "".join(batch)
+                    batch = []
+            batch.append("]}")
+            yield "".join(batch)
+
+        return ndjson_chunks() if ndjson else json_chunks()
+
+    @_reads
+    def export_to_file(self, export_options: Dict[str, Any],
+                       progress: Optional[Callable[[int, int], None]] = None) -> str:
+        """
+        Writes an export with the given options to the exports directory
+        and returns its filename. Only the newest exports written this way
+        are kept, so repeated exports cannot fill the disk.
+        """
+        if not self.library:
+            raise ValueError("Library not loaded.")
+        filename = f"library_export_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}.json"
+        if self.file_manager.export_library(
+            self.library,
+            filename,
+            cluster_ids=export_options.get("cluster_ids"),
+            standard_ids=export_options.get("standard_ids"),
+            include_rationales=export_options.get("include_rationales", True),
+            progress=progress
+        ):
+            self.file_manager.rotate_exports("library_export_*.json")
+            return filename
+        raise Exception("File manager failed to write the export file.")
+
+    def get_export_path(self, filename: str) -> Optional[Path]:
+        """
+        Returns the path of a file in the exports directory, or None if there
+        is no such file.
+        """
+        exports_dir = self.file_manager.exports_dir
+        export_path = exports_dir / filename
+        # Only serve files directly inside the exports directory
+        if export_path.parent == exports_dir and export_path.is_file():
+            return export_path
+        return None
+
+    # --- Background Jobs ---
+    # Each start_*_job method queues an operation and returns its Job at once,
+    # or None if too many jobs are already pending.
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return self.jobs.get(job_id)
+
+    def start_backup_job(self) -> Optional[Job]:
+        def backup(job: Job) -> Dict[str, Any]:
+            return {"filename": self.create_backup()}
+        return self.jobs.submit("backup", backup)
+
+    def start_export_job(self, export_options: Dict[str, Any]) -> Optional[Job]:
+        def export(job: Job) -> Dict[str, Any]:
+            return {"filename": self.export_to_file(export_options, job.progress)}
+        return self.jobs.submit("export", export)
+
+    def start_restore_backup_job(self, filename: str) -> Optional[Job]:
+        def restore(job: Job) -> Dict[str, Any]:
+            if not self.restore_from_backup(filename):
+                raise Exception(
+                    f"Backup '{filename}' not found or could not be restored."
+                )
+            return {"filename": filename}
+        return self.jobs.submit("restore", restore)
+
+    def start_restore_upload_job(self, file_stream) -> Optional[Job]:
+        """
+        An upload can only be read while its request lasts, so it is first
+        copied to a temp file, which the job restores from and then deletes.
+        Progress is counted in bytes.
+        """
+        fd, tmp_name = tempfile.mkstemp(
+            dir=self.file_manager.base_dir, prefix=".upload.", suffix=".tmp"
+        )
+        with os.fdopen(fd, 'wb') as f:
+            shutil.copyfileobj(file_stream, f)
+
+        def restore(job: Job) -> Dict[str, Any]:
+            try:
+                job.progress(0, os.path.getsize(tmp_name))
+                with open(tmp_name, 'rb') as f:
+                    stats = self.restore_from_file(f, job.progress)
+                if stats is None:
+                    raise Exception("Restore failed. Invalid file or server error.")
+                return stats
+            finally:
+                os.unlink(tmp_name)
+
+        job = self.jobs.submit("restore", restore)
+        if job is None:
+            os.unlink(tmp_name)
+        return job
+
+    # --- Similarity Search ---
+
+    # Upper bound on the number of results one query may ask for
+    MAX_TOP_K = 100
+    # Upper bound on the number of profiles scored in one call
+    MAX_SCORE_PROFILES = 10_000
+
+    @_reads
+    def find_similar_standards(self, query: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Finds the standards whose MAC vectors are closest to either an existing
+        standard ("standard_id", which is left out of the results) or a given
+        "mac_vector". Options: "k" (default 10), "metric" ("cosine", "l1" or
+        "l2"), "weighted" (multiply by importance weight) and "cluster_ids".
+        """
+        standard_id = query.get("standard_id")
+        if standard_id:
+            std = self.library.standards.get(standard_id)
+            if std is None:
+                raise ValueError(f"Standard with ID '{standard_id}' not found.")
+            vector = as_vector(std.mac_vector.to_dict())
+        elif query.get("mac_vector") is not None:
+            vector = as_vector(query["mac_vector"])
+        else:
+            raise ValueError("Provide either 'standard_id' or 'mac_vector'.")
+
+        k = self._top_k(query.get("k", 10))
+        metric = query.get("metric", "cosine")
+        weighted = bool(query.get("weighted", False))
+        cluster_ids = query.get("cluster_ids") or None
+        if isinstance(cluster_ids, str):
+            cluster_ids = [cluster_ids]
+
+        matches = self.mac_store.nearest(
+            vector, k, metric=metric, weighted=weighted,
+            cluster_ids=cluster_ids, exclude_id=standard_id or None
+        )
+        results = []
+        for match_id, score in matches:
+            match = self.library.standards.get(match_id)
+            results.append({
+                "id": match_id,
+                "name": match.name,
+                "cluster": match.cluster,
+                "score": round(score, 6)
+            })
+        return {"metric": metric, "weighted": weighted, "results": results}
+
+    # --- Full-Text Search ---
+
+    @_reads
+    def search_standards(self, query: str, limit: int = 20) -> Dict[str, Any]:
+        """
+        Searches the IDs, names, descriptions and rationales of all standards.
+        Every word of the query must match; words of at least
+        SearchIndex.MIN_PREFIX letters also match longer words they start.
+        """
+        if not query or not query.strip():
+            raise ValueError("The search query must not be empty.")
+        limit = self._top_k(limit, "limit")
+        results = []
+        for standard_id, score in self.search_index.search(query, limit):
+            std = self.library.standards.get(standard_id)
+            results.append({
+                "id": standard_id,
+                "name": std.name,
+                "cluster": std.cluster,
+                "score": round(score, 4)
+            })
+        return {"query": query, "results": results}
+
+    # --- MAC Scoring ---
+
+    @_reads
+    def score_profiles(
+        self, profiles, k: int = 10, weighted: bool = True,
+        cluster_ids: Optional[List[str]] = None
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Ranks all standards against one or many MAC profiles (dicts of
+        dimension values, lists of 7 numbers, or an M x 7 array). A standard's
+        score is the dot product of profile and MAC vector, times its importance
+        weight if weighted. Returns the top k standards per profile, best first,
+        in the order the profiles were given.
+        """
+        matrix = as_matrix(profiles)
+        if len(matrix) > self.MAX_SCORE_PROFILES:
+            raise ValueError(
+                f"At most {self.MAX_SCORE_PROFILES} profiles can be scored at once."
+            )
+        if isinstance(cluster_ids, str):
+            cluster_ids = [cluster_ids]
+
+        top_rows, top_scores = self.mac_store.top_scores(
+            matrix, self._top_k(k), weighted=weighted, cluster_ids=cluster_ids or None
+        )
+        ids = self.mac_store.ids
+        return [
+            [
+                {"id": ids[row], "score": round(score, 6)}
+                for row, score in zip(rows, scores)
+            ]
+            for rows, scores in zip(top_rows.tolist(), top_scores.tolist())
+        ]
+
+    def _top_k(self, k, name: str = "k") -> int:
+        """Validates a requested number of results, given as the parameter `name`."""
+        try:
+            k = int(k)
+        except (TypeError, ValueError):
+            raise ValueError(f"'{name}' must be an integer.")
+        if not 1 <= k <= self.MAX_TOP_K:
+            raise ValueError(f"'{name}' must be between 1 and {self.MAX_TOP_K}.")
+        return k
+
     # --- Cluster Maintenance ---
 
-    def _reorder_clusters(self, target_order: int, cluster_to_exclude_id: Optional[str] = None):
+    def _reorder_clusters(self, library: Library, target_order: int,
+                          cluster_to_exclude_id: Optional[str] = None):
         """Shifts cluster orders to make room for a new or updated cluster."""
-        for cluster in self.library.clusters:
+        for cluster in library.clusters:
             if cluster.id == cluster_to_exclude_id:
                 continue
             if cluster.order >= target_order:
                 cluster.order += 1
 
+    def _cluster_changes(self, orders_before: Dict[str, int],
+                         cluster_id: str) -> List[Change]:
+        """
+        Changes for a cluster edit: the cluster itself plus every cluster whose
+        order shifted.
+        """
+        changes = [Change("cluster", cluster_id)]
+        for cluster in self.library.clusters:
+            if cluster.id == cluster_id:
+                continue
+            if orders_before.get(cluster.id) != cluster.order:
+                changes.append(Change("cluster", cluster.id))
+        return changes
+
+    @_writes
     def create_cluster(self, data: Dict[str, Any]) -> Dict[str, Any]:
         """Creates a new cluster, reorders others, and saves."""
+        orders_before = {c.id: c.order for c in self.library.clusters}
+        new_cluster = self._insert_cluster(self.library, data)
+        self._commit(self._cluster_changes(orders_before, new_cluster.id))
+        return new_cluster.to_dict()
+
+    def _insert_cluster(self, library: Library, data: Dict[str, Any]) -> Cluster:
+        """Validates and inserts a new cluster into the given library without saving."""
         new_id = data.get("id")
         if not new_id or not new_id.strip():
             raise ValueError("Cluster ID cannot be empty.")
-        if any(c.id == new_id for c in self.library.clusters):
+        if new_id in library.clusters:
             raise ValueError(f"Cluster ID '{new_id}' already exists.")
 
         new_order = int(data.get("order", 1))
-        self._reorder_clusters(new_order)
+        self._reorder_clusters(library, new_order)
 
         new_cluster = Cluster(
             id=new_id,
@@ -251,73 +1008,98 @@ class LibraryController:
             description=data.get("description", ""),
             order=new_order
         )
-        self.library.clusters.append(new_cluster)
-        self.library.clusters.sort(key=lambda c: c.order)
-        self.file_manager.save_library(self.library)
-        return new_cluster.to_dict()
+        library.clusters.add(new_cluster)
+        return new_cluster
 
+    @_writes
     def update_cluster(self, cluster_id: str, data: Dict[str, Any]) -> Dict[str, Any]:
         """Updates an existing cluster's details."""
-        cluster_to_update = next((c for c in self.library.clusters if c.id == cluster_id), None)
+        orders_before = {c.id: c.order for c in self.library.clusters}
+        cluster_to_update = self._apply_cluster_update(self.library, cluster_id, data)
+        self._commit(self._cluster_changes(orders_before, cluster_id))
+        return cluster_to_update.to_dict()
+
+    def _apply_cluster_update(self, library: Library, cluster_id: str,
+                              data: Dict[str, Any]) -> Cluster:
+        """Applies an update to a cluster of the given library without saving."""
+        cluster_to_update = library.clusters.get(cluster_id)
         if not cluster_to_update:
             raise ValueError(f"Cluster '{cluster_id}' not found.")
 
         new_order = int(data.get("order", cluster_to_update.order))
         if new_order != cluster_to_update.order:
-            self._reorder_clusters(new_order, cluster_to_exclude_id=cluster_id)
+            self._reorder_clusters(library, new_order, cluster_to_exclude_id=cluster_id)
 
         cluster_to_update.name = data.get("name", cluster_to_update.name)
         cluster_to_update.description = data.get("description", cluster_to_update.description)
         cluster_to_update.order = new_order
 
-        self.library.clusters.sort(key=lambda c: c.order)
-        self.file_manager.save_library(self.library)
-        return cluster_to_update.to_dict()
+        library.clusters.resort()
+        return cluster_to_update
 
+    @_writes
     def delete_cluster(self, cluster_id: str):
         """Deletes a cluster if it is not in use."""
-        standards_using_cluster = [s.id for s in self.library.standards if s.cluster == cluster_id]
-        if standards_using_cluster:
-            raise ValueError(f"Cannot delete cluster '{cluster_id}' because it is in use by {len(standards_using_cluster)} standard(s).")
+        usage_count = self.library.standards.count_in_cluster(cluster_id)
+        if usage_count:
+            raise ValueError(
+                f"Cannot delete cluster '{cluster_id}' because it is in use by "
+                f"{usage_count} standard(s)."
+            )
 
-        cluster_to_delete = next((c for c in self.library.clusters if c.id == cluster_id), None)
+        # Remove the cluster
+        cluster_to_delete = self.library.clusters.remove(cluster_id)
         if not cluster_to_delete:
             # This case should ideally not be hit if called from a valid UI, but it's good practice.
             return
 
         deleted_order = cluster_to_delete.order
 
-        # Remove the cluster
-        self.library.clusters = [c for c in self.library.clusters if c.id != cluster_id]
-
         # Decrement the order of subsequent clusters
+        changes = [Change("cluster", cluster_id, deleted=True)]
         for cluster in self.library.clusters:
             if cluster.order > deleted_order:
                 cluster.order -= 1
+                changes.append(Change("cluster", cluster.id))
 
-        self.file_manager.save_library(self.library)
+        self._commit(changes)
 
     # --- Import Logic ---
 
-    def _import_clusters(self, clusters_data: list, report: dict):
-        """Helper method to process and import clusters."""
+    def _stage_library(self) -> Library:
+        """
+        Returns a working copy of the library that an import can modify freely.
+        Clusters are copied (imports reorder them in place), while standards are
+        shared with the live library and only copied when an import updates them.
+        """
+        return Library(
+            version=self.library.version,
+            last_modified=self.library.last_modified,
+            clusters=ClusterIndex(replace(c) for c in self.library.clusters),
+            standards=self.library.standards.copy()
+        )
+
+    def _import_clusters(self, staged: Library, clusters_data: list, report: dict,
+                         errors: list):
+        """Helper method to stage clusters for import."""
         for cluster_data in clusters_data:
             cluster_id = cluster_data.get("id")
             if not cluster_id:
                 continue  # Skip clusters without an ID
 
-            if any(c.id == cluster_id for c in self.library.clusters):
-                self.update_cluster(cluster_id, cluster_data)
-                report["clusters_updated"] += 1
-            else:
-                self.create_cluster(cluster_data)
-                report["clusters_added"] += 1
-
-    def _import_standards(self, standards_data: list, report: dict):
-        """Helper method to process and import standards."""
-        existing_standard_ids = {s.id for s in self.library.standards}
-        existing_cluster_ids = {c.id for c in self.library.clusters}
+            try:
+                if cluster_id in staged.clusters:
+                    self._apply_cluster_update(staged, cluster_id, cluster_data)
+                    report["clusters_updated"] += 1
+                else:
+                    self._insert_cluster(staged, cluster_data)
+                    report["clusters_added"] += 1
+            except (ValueError, TypeError) as e:
+                errors.append(f"Cluster '{cluster_id}': {e}")
 
+    def _import_standards(self, staged: Library, standards_data: list, report: dict,
+                          errors: list):
+        """Helper method to stage standards for import."""
         for standard_data in standards_data:
             standard_id = standard_data.get("id")
             cluster_id = standard_data.get("cluster")
@@ -325,29 +1107,52 @@ class LibraryController:
             if not standard_id or not cluster_id:
                 continue  # Skip standards without an ID or cluster
 
-            if cluster_id not in existing_cluster_ids:
+            if cluster_id not in staged.clusters:
                 report["standards_skipped"] += 1
                 report["skipped_reasons"].append(
                     f"Standard '{standard_id}' skipped: Cluster '{cluster_id}' does not exist."
                 )
                 continue
 
-            if standard_id in existing_standard_ids:
-                self.update_standard(standard_id, standard_data)
-                report["standards_updated"] += 1
-            else:
-                self.create_standard(standard_data)
-                report["standards_added"] += 1
+            try:
+                existing = staged.standards.get(standard_id)
+                if existing:
+                    # Update a private copy so the live library is left untouched
+                    std = replace(existing)
+                    self._apply_standard_update(std, standard_data)
+                    staged.standards.put(std)
+                    report["standards_updated"] += 1
+                else:
+                    staged.standards.put(self._build_standard(standard_data))
+                    report["standards_added"] += 1
+            except (ValueError, TypeError) as e:
+                errors.append(f"Standard '{standard_id}': {e}")
 
+    @_writes
     def import_from_file(self, file_stream) -> Dict[str, Any]:
         """
         Imports clusters and standards from an uploaded file stream using a
         two-pass 'merge and validate' strategy.
+
+        All changes are staged on a copy of the library and validated as one
+        batch. The library is only saved (once) and swapped in if every item
+        is valid; otherwise a ValueError is raised and nothing is changed.
+        The report includes the time spent in each phase, in milliseconds;
+        items are validated as they are staged, so "stage" covers both.
         """
+        timings = {}
+        phase_start = time.perf_counter()
+
         try:
             import_data = json.load(file_stream)
         except (json.JSONDecodeError, UnicodeDecodeError):
             raise ValueError("Invalid JSON file. Please ensure the file is a valid JSON.")
+        if not isinstance(import_data, dict):
+            raise ValueError(
+                "Invalid import file. Expected a JSON object with 'clusters' and "
+                "'standards'."
+            )
+        phase_start = self._record_timing(timings, "parse", phase_start)
 
         report = {
             "clusters_added": 0,
@@ -357,11 +1162,42 @@ class LibraryController:
             "standards_skipped": 0,
             "skipped_reasons": []
         }
+        errors = []
+        staged = self._stage_library()
 
         # --- Pass 1: Synchronize Clusters ---
-        self._import_clusters(import_data.get("clusters", []), report)
+        self._import_clusters(staged, import_data.get("clusters", []), report, errors)
 
         # --- Pass 2: Merge Standards ---
-        self._import_standards(import_data.get("standards", []), report)
+        self._import_standards(staged, import_data.get("standards", []), report, errors)
+        phase_start = self._record_timing(timings, "stage", phase_start)
+
+        # --- Validate the batch as a whole before committing anything ---
+        if errors:
+            shown = "; ".join(errors[:10])
+            if len(errors) > 10:
+                shown += f"; ... and {len(errors) - 10} more"
+            raise ValueError(
+                f"Import aborted, no changes were saved. {len(errors)} invalid "
+                f"item(s): {shown}"
+            )
+
+        # --- Commit: a single write, then swap the staged library in ---
+        staged.revision = self.library.revision + 1
+        if not self.file_manager.save_library(staged):
+            raise Exception("Import failed: the library could not be saved.")
+        self._set_library(staged, self._changes_to(staged))
+        self._record_timing(timings, "commit", phase_start)
 
-        return report
\ No newline at end of file
+        report["timings_ms"] = timings
+        return report
+
+    @staticmethod
+    def _record_timing(timings: dict, phase: str, phase_start: float) -> float:
+        """
+        Records the elapsed time of a phase in milliseconds and returns the new
+        start time.
+        """
+        now = time.perf_counter()
+        timings[phase] = round((now - phase_start) * 1000, 2)
+        return now
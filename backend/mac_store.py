@@ -0,0 +1,386 @@
+"""
+Columnar (NumPy) view of the MAC data of every standard in the library
+"""
+from dataclasses import fields
+from itertools import chain
+from operator import attrgetter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from models import Change, Library, MACVector, Standard
+
+# Column order of the vector matrix
+MAC_DIMENSIONS = tuple(f.name for f in fields(MACVector))
+
+_mac_values = attrgetter(*MAC_DIMENSIONS)
+_rationale_texts = attrgetter(*(f"{dim}_rationale" for dim in MAC_DIMENSIONS))
+
+# Largest possible L1 and L2 distance between two MAC vectors that sum to 1.0
+_MAX_DISTANCE = {"l1": 2.0, "l2": float(np.sqrt(2.0))}
+
+SIMILARITY_METRICS = ("cosine", "l1", "l2")
+
+def _normalized(vectors: np.ndarray) -> np.ndarray:
+    """
+    Scales vectors (rows of a 2-D array, or a single vector) to unit length,
+    leaving zero vectors as zeros
+    """
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
+
+def as_vector(profile) -> np.ndarray:
+    """
+    Convert a MAC profile, given as a dict of dimension values (missing
+    dimensions are 0) or a list of 7 numbers in MAC_DIMENSIONS order, to an array.
+    """
+    if isinstance(profile, dict):
+        unknown = set(profile) - set(MAC_DIMENSIONS)
+        if unknown:
+            raise ValueError(f"Unknown MAC dimension(s): {', '.join(sorted(unknown))}")
+        profile = [profile.get(dim, 0.0) for dim in MAC_DIMENSIONS]
+    try:
+        vector = np.array(profile, dtype=float)
+    except (TypeError, ValueError):
+        raise ValueError("MAC profile values must be numbers.")
+    if vector.shape != (len(MAC_DIMENSIONS),) or not np.isfinite(vector).all():
+        raise ValueError(f"A MAC profile needs {len(MAC_DIMENSIONS)} finite values.")
+    return vector
+
+def as_matrix(profiles) -> np.ndarray:
+    """Convert one or many MAC profiles (see as_vector) to an M x 7 array"""
+    if isinstance(profiles, np.ndarray) and profiles.dtype.kind in "fiu":
+        matrix = np.atleast_2d(profiles).astype(float, copy=False)
+        width = len(MAC_DIMENSIONS)
+        shaped = matrix.ndim == 2 and matrix.shape[1] == width
+        if not shaped or not np.isfinite(matrix).all():
+            raise ValueError(
+                f"MAC profiles must be an M x {width} array of finite values."
+            )
+        return matrix
+    if not isinstance(profiles, (dict, list, tuple)):
+        raise ValueError("MAC profiles must be a profile or a list of profiles.")
+    single = isinstance(profiles, dict) or (
+        len(profiles) and not isinstance(profiles[0], (dict, list, tuple, np.ndarray))
+    )
+    if single:
+        profiles = [profiles]
+    if not len(profiles):
+        return np.zeros((0, len(MAC_DIMENSIONS)))
+    return np.array([as_vector(profile) for profile in profiles])
+
+class MACStore:
+    """
+    Keeps every standard's MAC vector as one row of an N x 7 float array,
+    alongside arrays of importance weights, cluster codes and which name and
+    rationale texts are filled in, so checks and aggregations run as whole-array
+    operations instead of per-object loops.
+
+    Rows are in no particular order; ids[row] names the standard of a row.
+    The arrays returned by the properties are views that the next update may
+    change, so copy them if they are used outside the controller's locks.
+    """
+
+    def __init__(self, capacity: int = 64):
+        self._vectors = np.zeros((capacity, len(MAC_DIMENSIONS)))
+        self._weights = np.zeros(capacity)
+        self._cluster_codes = np.zeros(capacity, dtype=np.int32)
+        self._has_rationale = np.zeros((capacity, len(MAC_DIMENSIONS)), dtype=bool)
+        self._has_name = np.zeros(capacity, dtype=bool)
+        # Unit-length copies of the vectors (zero rows stay zero), for cosine similarity
+        self._unit = np.zeros((capacity, len(MAC_DIMENSIONS)))
+        # Squared lengths, so L2 distances need one matrix-vector product
+        self._sq_norms = np.zeros(capacity)
+        self.ids: List[str] = []
+        self._rows: Dict[str, int] = {}
+        # Clusters are interned as small integers; codes are never reused
+        self.cluster_names: List[str] = []
+        self._cluster_code_of: Dict[str, int] = {}
+
+    @classmethod
+    def from_library(cls, library: Library) -> "MACStore":
+        """Build a store for all standards, filling each column in one go"""
+        standards = list(library.standards)
+        count = len(standards)
+        store = cls(capacity=max(64, count))
+        if not count:
+            return store
+
+        store.ids = [std.id for std in standards]
+        store._rows = {standard_id: row for row, standard_id in enumerate(store.ids)}
+        width = len(MAC_DIMENSIONS)
+        store._vectors[:count] = np.fromiter(
+            chain.from_iterable(_mac_values(std.mac_vector) for std in standards),
+            float, count * width
+        ).reshape(count, width)
+        store._weights[:count] = [std.importance_weight for std in standards]
+        store._cluster_codes[:count] = [
+            store._intern_cluster(std.cluster) for std in standards
+        ]
+        texts = chain.from_iterable(
+            _rationale_texts(std.rationale) for std in standards
+        )
+        store._has_rationale[:count] = np.fromiter(
+            map(bool, map(str.strip, texts)), bool, count * width
+        ).reshape(count, width)
+        store._has_name[:count] = [bool(std.name) for std in standards]
+        store._unit[:count] = _normalized(store._vectors[:count])
+        vectors = store._vectors[:count]
+        store._sq_norms[:count] = np.einsum("ij,ij->i", vectors, vectors)
+        return store
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def vectors(self) -> np.ndarray:
+        """N x 7 array of MAC vectors, columns in MAC_DIMENSIONS order"""
+        return self._vectors[:len(self.ids)]
+
+    @property
+    def weights(self) -> np.ndarray:
+        """Importance weight of each row"""
+        return self._weights[:len(self.ids)]
+
+    @property
+    def cluster_codes(self) -> np.ndarray:
+        """Cluster code of each row; see cluster_code()"""
+        return self._cluster_codes[:len(self.ids)]
+
+    @property
+    def has_rationale(self) -> np.ndarray:
+        """N x 7 booleans: whether the rationale of each MAC dimension has text"""
+        return self._has_rationale[:len(self.ids)]
+
+    @property
+    def has_name(self) -> np.ndarray:
+        """Whether each row's standard has a name"""
+        return self._has_name[:len(self.ids)]
+
+    def row_of(self, standard_id: str) -> Optional[int]:
+        return self._rows.get(standard_id)
+
+    def cluster_code(self, cluster_id: str) -> int:
+        """Return the integer code of a cluster, or -1 if no standard ever used it"""
+        return self._cluster_code_of.get(cluster_id, -1)
+
+    # --- Maintenance ---
+
+    def upsert(self, std: Standard):
+        """Insert or refresh the row of a standard"""
+        row = self._rows.get(std.id)
+        if row is None:
+            row = len(self.ids)
+            if row == len(self._weights):
+                self._grow()
+            self.ids.append(std.id)
+            self._rows[std.id] = row
+
+        self._vectors[row] = _mac_values(std.mac_vector)
+        self._weights[row] = std.importance_weight
+        self._cluster_codes[row] = self._intern_cluster(std.cluster)
+        self._has_rationale[row] = [
+            bool(text.strip()) for text in _rationale_texts(std.rationale)
+        ]
+        self._has_name[row] = bool(std.name)
+        self._unit[row] = _normalized(self._vectors[row])
+        self._sq_norms[row] = self._vectors[row] @ self._vectors[row]
+
+    def remove(self, standard_id: str):
+        """Drop the row of a standard by moving the last row into its place"""
+        row = self._rows.pop(standard_id, None)
+        if row is None:
+            return
+        last = len(self.ids) - 1
+        if row != last:
+            moved_id = self.ids[last]
+            self._vectors[row] = self._vectors[last]
+            self._weights[row] = self._weights[last]
+            self._cluster_codes[row] = self._cluster_codes[last]
+            self._has_rationale[row] = self._has_rationale[last]
+            self._has_name[row] = self._has_name[last]
+            self._unit[row] = self._unit[last]
+            self._sq_norms[row] = self._sq_norms[last]
+            self.ids[row] = moved_id
+            self._rows[moved_id] = row
+        self.ids.pop()
+
+    def apply(self, library: Library, changes: Iterable[Change]):
+        """Bring the rows of changed standards up to date with the library"""
+        for change in changes:
+            if change.entity != "standard":
+                continue
+            std = None if change.deleted else library.standards.get(change.entity_id)
+            if std is None:
+                self.remove(change.entity_id)
+            else:
+                self.upsert(std)
+
+    def _intern_cluster(self, cluster_id: str) -> int:
+        code = self._cluster_code_of.get(cluster_id)
+        if code is None:
+            code = len(self.cluster_names)
+            self.cluster_names.append(cluster_id)
+            self._cluster_code_of[cluster_id] = code
+        return code
+
+    def _grow(self):
+        capacity = max(64, 2 * len(self._weights))
+        self._vectors = np.resize(self._vectors, (capacity, len(MAC_DIMENSIONS)))
+        self._weights = np.resize(self._weights, capacity)
+        self._cluster_codes = np.resize(self._cluster_codes, capacity)
+        self._has_rationale = np.resize(
+            self._has_rationale, (capacity, len(MAC_DIMENSIONS))
+        )
+        self._has_name = np.resize(self._has_name, capacity)
+        self._unit = np.resize(self._unit, (capacity, len(MAC_DIMENSIONS)))
+        self._sq_norms = np.resize(self._sq_norms, capacity)
+
+    # --- Vectorized Operations ---
+
+    def sums(self) -> np.ndarray:
+        """Sum of each MAC vector"""
+        return self.vectors.sum(axis=1)
+
+    def invalid_mask(self, tolerance: float = 0.0001) -> np.ndarray:
+        """
+        True for rows whose MAC vector does not sum to 1.0 (see
+        MACVector.is_valid)
+        """
+        return ~(np.abs(self.sums() - 1.0) < tolerance)
+
+    def cluster_mask(self, cluster_ids: Iterable[str]) -> np.ndarray:
+        """True for rows belonging to any of the given clusters"""
+        codes = [self.cluster_code(c) for c in cluster_ids]
+        return np.isin(self.cluster_codes, codes)
+
+    def mean_vector(self, cluster_ids: Optional[Iterable[str]] = None,
+                    weighted: bool = True) -> Dict[str, float]:
+        """
+        Average MAC composition over the library (or the given clusters),
+        optionally weighted by importance. Returns zeros for an empty selection.
+        """
+        vectors, weights = self.vectors, self.weights
+        if cluster_ids is not None:
+            mask = self.cluster_mask(cluster_ids)
+            vectors, weights = vectors[mask], weights[mask]
+
+        mean = np.zeros(len(MAC_DIMENSIONS))
+        if weighted:
+            total = weights.sum()
+            if total > 0:
+                mean = weights @ vectors / total
+        elif len(vectors):
+            mean = vectors.mean(axis=0)
+        return dict(zip(MAC_DIMENSIONS, mean.tolist()))
+
+    def similarity(self, vector: np.ndarray, metric: str = "cosine") -> np.ndarray:
+        """
+        Similarity of every row to a MAC vector, between 0 and 1 (higher is
+        closer). L1 and L2 distances are scaled by the largest distance two
+        valid MAC vectors can have, so 0 means as far apart as possible.
+        """
+        count = len(self.ids)
+        if metric == "cosine":
+            return self._unit[:count] @ _normalized(vector)
+        if metric == "l1":
+            # Column by column avoids an N x 7 temporary
+            distances = np.abs(self._vectors[:count, 0] - vector[0])
+            for dim in range(1, len(MAC_DIMENSIONS)):
+                distances += np.abs(self._vectors[:count, dim] - vector[dim])
+        elif metric == "l2":
+            # |v - q|^2 = |v|^2 - 2 v.q + |q|^2
+            squared = (
+                self._sq_norms[:count] - 2.0 * (self.vectors @ vector) + vector @ vector
+            )
+            distances = np.sqrt(np.maximum(squared, 0.0))
+        else:
+            raise ValueError(
+                f"Unknown metric '{metric}'. "
+                f"Use one of: {', '.join(SIMILARITY_METRICS)}."
+            )
+        return np.clip(1.0 - distances / _MAX_DISTANCE[metric], 0.0, 1.0)
+
+    def nearest(self, vector: np.ndarray, k: int = 10, metric: str = "cosine",
+                weighted: bool = False, cluster_ids: Optional[Iterable[str]] = None,
+                exclude_id: Optional[str] = None) -> List[Tuple[str, float]]:
+        """
+        Return up to k (standard ID, score) pairs closest to a MAC vector, best
+        first. The score is the similarity, multiplied by the importance weight
+        if weighted. Optionally restricted to the given clusters, and leaving
+        out one standard (typically the one being compared).
+        """
+        scores = self.similarity(vector, metric)
+        if weighted:
+            scores = scores * self.weights
+        candidates = None
+        if cluster_ids is not None:
+            candidates = np.flatnonzero(self.cluster_mask(cluster_ids))
+        exclude_row = self._rows.get(exclude_id) if exclude_id is not None else None
+        if exclude_row is not None:
+            if candidates is None:
+                candidates = np.arange(len(self.ids))
+            candidates = candidates[candidates != exclude_row]
+        if candidates is not None:
+            scores = scores[candidates]
+
+        k = min(k, len(scores))
+        if k <= 0:
+            return []
+        if k < len(scores):
+            top = np.argpartition(scores, len(scores) - k)[-k:]
+        else:
+            top = np.arange(len(scores))
+        top = top[np.argsort(-scores[top], kind="stable")]
+        rows = candidates[top] if candidates is not None else top
+        return [
+            (self.ids[row], float(score))
+            for row, score in zip(rows.tolist(), scores[top].tolist())
+        ]
+
+    # Upper bound on the size of the queries x standards score block computed at once
+    SCORE_BLOCK_CELLS = 4_000_000
+
+    def top_scores(self, profiles: np.ndarray, k: int = 10, weighted: bool = True,
+                   cluster_ids: Optional[Iterable[str]] = None
+                   ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Score every standard against each row of an M x 7 array of profiles as
+        the dot product of profile and MAC vector, times the importance weight
+        if weighted, and return the rows and scores of the top k per profile,
+        best first, as two M x k arrays.
+
+        All profiles are scored with a single matrix product, split into
+        blocks of profiles only to bound the memory of the intermediate scores.
+        """
+        vectors = self.vectors
+        weights = self.weights
+        rows = np.arange(len(self.ids))
+        if cluster_ids is not None:
+            rows = np.flatnonzero(self.cluster_mask(cluster_ids))
+            vectors, weights = vectors[rows], weights[rows]
+        # Scale the (small) standards matrix once instead of every block of scores
+        matrix = (vectors * weights[:, None] if weighted else vectors).T
+
+        count = len(rows)
+        k = min(k, count)
+        top_rows = np.zeros((len(profiles), k), dtype=np.intp)
+        top_scores = np.zeros((len(profiles), k))
+        if k <= 0:
+            return top_rows, top_scores
+
+        block = max(1, self.SCORE_BLOCK_CELLS // count)
+        for start in range(0, len(profiles), block):
+            scores = profiles[start:start + block] @ matrix
+            if k < count:
+                top = np.argpartition(scores, count - k, axis=1)[:, -k:]
+            else:
+                top = np.broadcast_to(np.arange(count), scores.shape)
+            top_block = np.take_along_axis(scores, top, axis=1)
+            order = np.argsort(-top_block, axis=1, kind="stable")
+            top_rows[start:start + block] = rows[
+                np.take_along_axis(top, order, axis=1)
+            ]
+            top_scores[start:start + block] = np.take_along_axis(
+                top_block, order, axis=1
+            )
+        return top_rows, top_scores
@@ -2,8 +2,9 @@
 Data models for Standards Library
 """
 from dataclasses import dataclass, field
-from typing import List, Optional
 from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional
+
 
 @dataclass
 class MACVector:
@@ -75,7 +76,13 @@ class Standard:
     date_created: str = field(default_factory=lambda: datetime.now().strftime("%Y-%m-%d"))
     date_modified: str = field(default_factory=lambda: datetime.now().strftime("%Y-%m-%d"))
     
-    def to_dict(self) -> dict:
+    def to_dict(self, fields: Optional[Iterable[str]] = None) -> dict:
+        """
+        All fields, or only the given ones (see STANDARD_FIELDS) without
+        serializing the rest
+        """
+        if fields is not None:
+            return {name: _STANDARD_FIELD_VALUES[name](self) for name in fields}
         return {
             "id": self.id,
             "name": self.name,
@@ -91,6 +98,24 @@ class Standard:
             "date_modified": self.date_modified
         }
 
+# How to serialize each field of Standard.to_dict()
+_STANDARD_FIELD_VALUES = {
+    "id": lambda std: std.id,
+    "name": lambda std: std.name,
+    "cluster": lambda std: std.cluster,
+    "description": lambda std: std.description,
+    "importance_weight": lambda std: std.importance_weight,
+    "mac_vector": lambda std: std.mac_vector.to_dict(),
+    "primary_focus": lambda std: std.primary_focus,
+    "secondary_focus": lambda std: std.secondary_focus,
+    "impacted_emotions": lambda std: std.impacted_emotions,
+    "rationale": lambda std: std.rationale.to_dict(),
+    "date_created": lambda std: std.date_created,
+    "date_modified": lambda std: std.date_modified,
+}
+
+STANDARD_FIELDS = tuple(_STANDARD_FIELD_VALUES)
+
 @dataclass
 class Cluster:
     """Represents a cluster of standards"""
@@ -107,18 +132,201 @@ class Cluster:
             "order": self.order
         }
 
+@dataclass
+class Change:
+    """One standard or cluster touched by a committed change"""
+    entity: str  # "standard" or "cluster"
+    entity_id: str
+    deleted: bool = False
+
+
+class StandardIndex:
+    """
+    Ordered collection of standards indexed by ID, with a secondary
+    cluster -> standard IDs index. Iterates in insertion order.
+
+    Standards may be modified in place; call put() afterwards so a
+    changed cluster is re-indexed.
+    """
+
+    def __init__(self, standards: Iterable[Standard] = ()):
+        self._by_id: Dict[str, Standard] = {}
+        self._cluster_of: Dict[str, str] = {}
+        # Insertion sequence numbers, to return subsets in collection order
+        self._seq: Dict[str, int] = {}
+        self._next_seq = 0
+        # Dicts with None values act as insertion-ordered sets
+        self._by_cluster: Dict[str, Dict[str, None]] = {}
+        for std in standards:
+            self.put(std)
+
+    def __iter__(self) -> Iterator[Standard]:
+        return iter(self._by_id.values())
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+    def __contains__(self, standard_id: str) -> bool:
+        return standard_id in self._by_id
+
+    def get(self, standard_id: str) -> Optional[Standard]:
+        """Return the standard with the given ID, or None"""
+        return self._by_id.get(standard_id)
+
+    def put(self, std: Standard):
+        """
+        Insert a standard, or replace the one with the same ID keeping its
+        position
+        """
+        old_cluster = self._cluster_of.get(std.id)
+        if old_cluster is not None and old_cluster != std.cluster:
+            self._unlink_cluster(std.id, old_cluster)
+        if std.id not in self._by_id:
+            self._seq[std.id] = self._next_seq
+            self._next_seq += 1
+        self._by_id[std.id] = std
+        self._cluster_of[std.id] = std.cluster
+        self._by_cluster.setdefault(std.cluster, {})[std.id] = None
+
+    def remove(self, standard_id: str) -> Optional[Standard]:
+        """Remove and return the standard with the given ID, or None if absent"""
+        std = self._by_id.pop(standard_id, None)
+        if std is not None:
+            self._unlink_cluster(standard_id, self._cluster_of.pop(standard_id))
+            del self._seq[standard_id]
+        return std
+
+    def in_order(self, standard_ids: Iterable[str]) -> List[Standard]:
+        """
+        Return the standards with the given IDs (unknown IDs are ignored) in
+        collection order
+        """
+        found = [self._by_id[i] for i in set(standard_ids) if i in self._by_id]
+        found.sort(key=lambda std: self._seq[std.id])
+        return found
+
+    def ids_in_cluster(self, cluster_id: str) -> List[str]:
+        """Return the IDs of all standards in a cluster"""
+        return list(self._by_cluster.get(cluster_id, ()))
+
+    def count_in_cluster(self, cluster_id: str) -> int:
+        """Return how many standards reference a cluster"""
+        return len(self._by_cluster.get(cluster_id, ()))
+
+    def copy(self) -> "StandardIndex":
+        """Return a shallow copy; the Standard objects themselves are shared"""
+        clone = StandardIndex()
+        clone._by_id = dict(self._by_id)
+        clone._cluster_of = dict(self._cluster_of)
+        clone._seq = dict(self._seq)
+        clone._next_seq = self._next_seq
+        clone._by_cluster = {c: dict(ids) for c, ids in self._by_cluster.items()}
+        return clone
+
+    def _unlink_cluster(self, standard_id: str, cluster_id: str):
+        members = self._by_cluster.get(cluster_id)
+        if members is not None:
+            members.pop(standard_id, None)
+            if not members:
+                del self._by_cluster[cluster_id]
+
+
+class ClusterIndex:
+    """
+    Clusters indexed by ID and kept sorted by their display order.
+
+    Call resort() after changing the order of any cluster in place.
+    """
+
+    def __init__(self, clusters: Iterable[Cluster] = ()):
+        self._by_id: Dict[str, Cluster] = {}
+        self._ordered: List[Cluster] = []
+        for cluster in clusters:
+            self._by_id[cluster.id] = cluster
+        self.resort()
+
+    def __iter__(self) -> Iterator[Cluster]:
+        return iter(self._ordered)
+
+    def __len__(self) -> int:
+        return len(self._ordered)
+
+    def __contains__(self, cluster_id: str) -> bool:
+        return cluster_id in self._by_id
+
+    def get(self, cluster_id: str) -> Optional[Cluster]:
+        """Return the cluster with the given ID, or None"""
+        return self._by_id.get(cluster_id)
+
+    def add(self, cluster: Cluster):
+        """Add a cluster (replacing any with the same ID) and keep the order sorted"""
+        self._by_id[cluster.id] = cluster
+        self.resort()
+
+    def remove(self, cluster_id: str) -> Optional[Cluster]:
+        """Remove and return the cluster with the given ID, or None if absent"""
+        cluster = self._by_id.pop(cluster_id, None)
+        if cluster is not None:
+            self._ordered.remove(cluster)
+        return cluster
+
+    def resort(self):
+        """Rebuild the ordered view after cluster orders have changed"""
+        # A stable sort keeps file order for clusters sharing an order value
+        self._ordered = sorted(self._by_id.values(), key=lambda c: c.order)
+
+
 @dataclass
 class Library:
     """The complete standards library"""
     version: str = "2.7"
     last_modified: str = field(default_factory=lambda: datetime.now().isoformat())
-    clusters: List[Cluster] = field(default_factory=list)
-    standards: List[Standard] = field(default_factory=list)
+    # Incremented on every committed change; persisted so workers can tell which
+    # copy is newer
+    revision: int = 0
+    clusters: ClusterIndex = field(default_factory=ClusterIndex)
+    standards: StandardIndex = field(default_factory=StandardIndex)
+
+    def __post_init__(self):
+        # Accept plain lists for convenience
+        if not isinstance(self.clusters, ClusterIndex):
+            self.clusters = ClusterIndex(self.clusters)
+        if not isinstance(self.standards, StandardIndex):
+            self.standards = StandardIndex(self.standards)
+
+    def select_standards(
+        self,
+        cluster_ids: Optional[Iterable[str]] = None,
+        standard_ids: Optional[Iterable[str]] = None
+    ) -> List[Standard]:
+        """
+        Return the standards matching both filters (a filter that is None or
+        empty matches everything), in library order. Uses the ID and cluster
+        indexes, so the cost depends on the size of the selection.
+        """
+        if not cluster_ids and not standard_ids:
+            return list(self.standards)
+
+        if standard_ids:
+            selected = set(standard_ids)
+            if cluster_ids:
+                wanted = set(cluster_ids)
+                selected = {
+                    i for i in selected
+                    if i in self.standards and self.standards.get(i).cluster in wanted
+                }
+        else:
+            selected = set()
+            for cluster_id in set(cluster_ids):
+                selected.update(self.standards.ids_in_cluster(cluster_id))
+
+        return self.standards.in_order(selected)
     
     def to_dict(self) -> dict:
         return {
             "version": self.version,
             "last_modified": self.last_modified,
+            "revision": self.revision,
             "clusters": [c.to_dict() for c in self.clusters],
             "standards": [s.to_dict() for s in self.standards]
-        }
\ No newline at end of file
+        }
@@ -0,0 +1,87 @@
+"""
+Reader-writer lock for sharing the in-memory library between threads
+"""
+import threading
+from contextlib import contextmanager
+
+
+class ReadWriteLock:
+    """
+    Allows any number of concurrent readers or a single writer.
+
+    Waiting writers block new readers, so a steady stream of reads cannot
+    starve a write. Both sides are reentrant within a thread, and the writer
+    may also take the read lock. Upgrading a read lock to a write lock is
+    not supported and raises RuntimeError instead of deadlocking.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = None
+        self._writer_depth = 0
+        self._waiting_writers = 0
+        self._local = threading.local()
+
+    def acquire_read(self):
+        depth = getattr(self._local, "reads", 0)
+        if depth == 0:
+            # The writer thread and nested reads never wait
+            counted = self._writer != threading.get_ident()
+            if counted:
+                with self._cond:
+                    while self._writer is not None or self._waiting_writers:
+                        self._cond.wait()
+                    self._readers += 1
+            self._local.counted = counted
+        self._local.reads = depth + 1
+
+    def release_read(self):
+        self._local.reads -= 1
+        if self._local.reads == 0 and self._local.counted:
+            with self._cond:
+                self._readers -= 1
+                if self._readers == 0:
+                    self._cond.notify_all()
+
+    def acquire_write(self):
+        me = threading.get_ident()
+        with self._cond:
+            if self._writer == me:
+                self._writer_depth += 1
+                return
+            if getattr(self._local, "reads", 0):
+                raise RuntimeError(
+                    "Cannot acquire the write lock while holding the read lock"
+                )
+            self._waiting_writers += 1
+            try:
+                while self._writer is not None or self._readers:
+                    self._cond.wait()
+            finally:
+                self._waiting_writers -= 1
+            self._writer = me
+            self._writer_depth = 1
+
+    def release_write(self):
+        with self._cond:
+            self._writer_depth -= 1
+            if self._writer_depth == 0:
+                self._writer = None
+                self._cond.notify_all()
+
+    @contextmanager
+    def read_locked(self):
+        self.acquire_read()
+        try:
+            yield
+        finally:
+            self.release_read()
+
+    @contextmanager
+    def write_locked(self):
+        self.acquire_write()
+        try:
+            yield
+        finally:
+            self.release_write()
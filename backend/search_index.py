@@ -0,0 +1,196 @@
+"""
+In-memory full-text index over the text of the standards in the library
+"""
+import heapq
+import math
+import re
+from bisect import bisect_left, insort
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from mac_store import _rationale_texts
+from models import Change, Library, Standard
+
+# Words, keeping hyphenated words such as standard IDs ("JE-1") together
+_TOKEN = re.compile(r"\w+(?:-\w+)*")
+
+# How much an occurrence of a term counts, by the field it occurs in
+FIELD_WEIGHTS = {"id": 3.0, "name": 3.0, "description": 1.5, "rationale": 1.0}
+
+def tokenize(text: str, split_hyphenated: bool = False) -> List[str]:
+    """
+    Lower-cased words of a text, optionally followed by the parts of
+    hyphenated words
+    """
+    tokens = _TOKEN.findall(text.lower())
+    if split_hyphenated:
+        tokens += [
+            part for token in tokens if "-" in token for part in token.split("-")
+        ]
+    return tokens
+
+def _weighted_terms(std: Standard) -> Dict[str, float]:
+    """Every term of a standard with the summed weight of its occurrences"""
+    fields = (
+        (FIELD_WEIGHTS["id"], std.id),
+        (FIELD_WEIGHTS["name"], std.name),
+        (FIELD_WEIGHTS["description"], std.description),
+        (FIELD_WEIGHTS["rationale"], "\n".join(_rationale_texts(std.rationale)))
+    )
+    weights: Dict[str, float] = {}
+    for weight, text in fields:
+        if text:
+            for term, count in Counter(tokenize(text, split_hyphenated=True)).items():
+                weights[term] = weights.get(term, 0.0) + count * weight
+    return weights
+
+class SearchIndex:
+    """
+    Inverted index from terms to the standards that contain them, kept in
+    step with the library by apply(), so a search only touches the postings
+    of the query terms instead of scanning every standard's text.
+
+    Every query word must match. Words of at least MIN_PREFIX characters,
+    including the last one typed, also match as a prefix (for
+    search-as-you-type), with exact matches ranked above prefix matches.
+    Shorter words only match whole terms, since a one- or two-letter prefix
+    would pull in the postings of most of the vocabulary.
+    Results are ranked by the field-weighted frequency of the matched terms
+    times their inverse document frequency.
+    """
+
+    # Query words shorter than this only match whole terms
+    MIN_PREFIX = 3
+    # Score factor of a prefix match relative to an exact match
+    PREFIX_PENALTY = 0.5
+
+    def __init__(self, library: Library):
+        self.rebuild(library)
+
+    def rebuild(self, library: Library):
+        """Index every standard from scratch"""
+        self._postings: Dict[str, Dict[str, float]] = defaultdict(dict)
+        self._terms_of: Dict[str, Set[str]] = {}
+        # Sorted vocabulary for prefix lookups, built in one go after a rebuild
+        self._vocabulary: Optional[List[str]] = None
+        for std in library.standards:
+            self._add(std)
+        self._vocabulary = sorted(self._postings)
+
+    def apply(self, library: Library, changes: Iterable[Change]):
+        """Re-index the standards touched by the given changes"""
+        for change in changes:
+            if change.entity != "standard":
+                continue
+            self._remove(change.entity_id)
+            std = None if change.deleted else library.standards.get(change.entity_id)
+            if std is not None:
+                self._add(std)
+
+    def __len__(self) -> int:
+        return len(self._terms_of)
+
+    def _add(self, std: Standard):
+        weights = _weighted_terms(std)
+        for term, weight in weights.items():
+            postings = self._postings[term]
+            if not postings and self._vocabulary is not None:
+                insort(self._vocabulary, term)
+            postings[std.id] = weight
+        self._terms_of[std.id] = set(weights)
+
+    def _remove(self, standard_id: str):
+        for term in self._terms_of.pop(standard_id, ()):
+            postings = self._postings[term]
+            del postings[standard_id]
+            if not postings:
+                del self._postings[term]
+                del self._vocabulary[bisect_left(self._vocabulary, term)]
+
+    def _expand(self, word: str) -> List[str]:
+        """
+        Every vocabulary term starting with word. None are left out, since that
+        would silently drop matching standards; a very short prefix can cost a
+        scan of a large part of the index instead.
+        """
+        vocabulary = self._vocabulary
+        # Terms sharing the prefix form one slice of the sorted vocabulary,
+        # ending before the prefix followed by the highest code point
+        start = bisect_left(vocabulary, word)
+        end = bisect_left(vocabulary, word + "\U0010ffff", start)
+        return vocabulary[start:end]
+
+    def search(self, query: str, limit: int = 20) -> List[Tuple[str, float]]:
+        """
+        Return up to limit (standard ID, score) pairs matching every word of
+        the query, best first
+        """
+        words = list(dict.fromkeys(tokenize(query)))
+        if not words:
+            return []
+
+        total = len(self._terms_of)
+        matches = []
+        for word in words:
+            if len(word) >= self.MIN_PREFIX:
+                terms = self._expand(word)
+            else:
+                terms = [word] if word in self._postings else []
+            if not terms:
+                return []
+            weighted_postings = []
+            for term in terms:
+                postings = self._postings[term]
+                factor = math.log(1 + total / len(postings))
+                if term != word:
+                    factor *= self.PREFIX_PENALTY
+                weighted_postings.append((postings, factor))
+            matches.append(weighted_postings)
+
+        # Start from the rarest word, then narrow down the candidates
+        matches.sort(key=self._postings_size)
+        scores = self._word_scores(matches[0])
+        for weighted_postings in matches[1:]:
+            lookups = len(scores) * len(weighted_postings)
+            if lookups < self._postings_size(weighted_postings):
+                # Fewer candidates than postings: look the candidates up
+                narrowed = {}
+                for standard_id, score in scores.items():
+                    best = max(
+                        postings.get(standard_id, 0.0) * factor
+                        for postings, factor in weighted_postings
+                    )
+                    if best > 0.0:
+                        narrowed[standard_id] = score + best
+            else:
+                word_scores = self._word_scores(weighted_postings)
+                narrowed = {
+                    standard_id: score + word_scores[standard_id]
+                    for standard_id, score in scores.items()
+                    if standard_id in word_scores
+                }
+            scores = narrowed
+            if not scores:
+                return []
+
+        return heapq.nsmallest(
+            limit, scores.items(), key=lambda item: (-item[1], item[0])
+        )
+
+    @staticmethod
+    def _postings_size(weighted_postings: List[Tuple[Dict[str, float], float]]) -> int:
+        return sum(len(postings) for postings, _ in weighted_postings)
+
+    @staticmethod
+    def _word_scores(
+        weighted_postings: List[Tuple[Dict[str, float], float]]
+    ) -> Dict[str, float]:
+        """Score of one query word for every standard it matches"""
+        scores: Dict[str, float] = {}
+        for postings, factor in weighted_postings:
+            for standard_id, weight in postings.items():
+                # A word counts once per standard, through its best-scoring term
+                score = weight * factor
+                if score > scores.get(standard_id, 0.0):
+                    scores[standard_id] = score
+        return scores
@@ -0,0 +1,90 @@
+"""
+Cached user and role lookups for the Standards Library
+"""
+import json
+import os
+import signal
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+
+class UserRegistry:
+    """
+    Holds the email -> role map from users.json in memory.
+
+    The file is parsed once and only re-read when its inode, mtime or size
+    changes (checked at most every check_interval seconds), or when reload()
+    is called explicitly, for example through reload_on_signal().
+    """
+
+    def __init__(self, users_file: str, check_interval: float = 1.0):
+        self.users_file = users_file
+        self.check_interval = check_interval
+        self._users: Dict[str, str] = {}
+        self._signature: Optional[Tuple[int, int, int]] = None
+        self._loaded = False
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+
+    def get_role(self, email: Optional[str]) -> Optional[str]:
+        """Return the role of a user, or None if the user is not registered"""
+        self._refresh()
+        return self._users.get(email)
+
+    def users(self) -> Dict[str, str]:
+        """Return a copy of the email -> role map"""
+        self._refresh()
+        return dict(self._users)
+
+    def reload(self):
+        """
+        Force the file to be read again on the next lookup. Takes no lock, so
+        it is safe to call from a signal handler.
+        """
+        self._loaded = False
+        self._next_check = 0.0
+
+    def reload_on_signal(self, signum: Optional[int] = getattr(signal, "SIGHUP", None)):
+        """Call reload() whenever the process receives the signal (SIGHUP by default)"""
+        # No SIGHUP on Windows; handlers can only be installed from the main thread
+        if signum is None or threading.current_thread() is not threading.main_thread():
+            return
+        signal.signal(signum, lambda received, frame: self.reload())
+
+    def _file_signature(self) -> Optional[Tuple[int, int, int]]:
+        try:
+            stat = os.stat(self.users_file)
+        except FileNotFoundError:
+            return None
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    def _refresh(self):
+        now = time.monotonic()
+        if self._loaded and now < self._next_check:
+            return
+
+        with self._lock:
+            if self._loaded and now < self._next_check:
+                return  # Another thread refreshed while we waited
+            self._next_check = now + self.check_interval
+
+            signature = self._file_signature()
+            if self._loaded and signature == self._signature:
+                return
+
+            if signature is None:
+                users = {}
+            else:
+                try:
+                    with open(self.users_file, 'r') as f:
+                        users = json.load(f).get('users', {})
+                except (OSError, json.JSONDecodeError) as e:
+                    # Most likely caught mid-edit: keep the last good map and
+                    # retry later
+                    print(f"Error loading users file: {e}")
+                    return
+
+            self._users = users
+            self._signature = signature
+            self._loaded = True
@@ -1,8 +1,12 @@
 """
 Validation logic for Standards Library
 """
-from typing import List, Tuple
-from models import Library, Standard, Cluster, MACVector
+from typing import Any, Container, Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+from mac_store import MAC_DIMENSIONS, MACStore
+from models import Change, Library, Standard
+
 
 class ValidationError:
     """Represents a validation error"""
@@ -11,20 +15,110 @@ class ValidationError:
         self.standard_id = standard_id
         self.message = message
     
+    def to_dict(self) -> dict:
+        return {"severity": self.severity, "message": self.message}
+
     def __str__(self):
         icon = "❌" if self.severity == "error" else "⚠️"
         return f"{icon} [{self.standard_id}] {self.message}"
 
+# --- Per-Standard Checks ---
+# Shared by LibraryValidator and the incrementally maintained ValidationState.
+
+def check_mac_vector(std: Standard) -> List[ValidationError]:
+    """MAC vector must sum to 1.0"""
+    if std.mac_vector.is_valid():
+        return []
+    actual_sum = std.mac_vector.sum()
+    return [ValidationError(
+        "error",
+        std.id,
+        f"MAC vector sums to {actual_sum:.4f}, must be 1.0"
+    )]
+
+def check_cluster_reference(std: Standard,
+                            cluster_ids: Container[str]) -> List[ValidationError]:
+    """Standard must reference an existing cluster"""
+    if std.cluster in cluster_ids:
+        return []
+    return [ValidationError(
+        "error",
+        std.id,
+        f"References non-existent cluster '{std.cluster}'"
+    )]
+
+def check_required_fields(std: Standard) -> List[ValidationError]:
+    """Required fields must be present and the importance weight in range"""
+    errors = []
+    if not std.id:
+        errors.append(ValidationError("error", "???", "Missing ID"))
+    if not std.name:
+        errors.append(ValidationError("error", std.id, "Missing name"))
+    if not std.cluster:
+        errors.append(ValidationError("error", std.id, "Missing cluster"))
+    if not (0 <= std.importance_weight <= 1):
+        errors.append(ValidationError(
+            "error",
+            std.id,
+            f"Importance weight {std.importance_weight} not in [0,1]"
+        ))
+    return errors
+
+def check_rationales(std: Standard) -> List[ValidationError]:
+    """Any MAC dimension > 0.1 needs rationale text (warnings, not errors)"""
+    warnings = []
+    for dim in MAC_DIMENSIONS:
+        rationale = getattr(std.rationale, f"{dim}_rationale")
+        if getattr(std.mac_vector, dim) > 0.1 and not rationale.strip():
+            warnings.append(ValidationError(
+                "warning",
+                std.id,
+                f"Missing {dim}_rationale (MAC value > 0.1)"
+            ))
+    return warnings
+
+def validate_standard(std: Standard,
+                      cluster_ids: Container[str]) -> List[ValidationError]:
+    """Run every per-standard check (all but duplicate detection)"""
+    return (check_mac_vector(std)
+            + check_cluster_reference(std, cluster_ids)
+            + check_required_fields(std)
+            + check_rationales(std))
+
+def check_duplicate_ids(ids: Iterable[str],
+                        kind: str = "standard") -> List[ValidationError]:
+    """Every repeat of an ID is a duplicate. kind is 'standard' or 'cluster'."""
+    errors = []
+    seen_ids = set()
+    for item_id in ids:
+        if item_id in seen_ids:
+            label = item_id if kind == "standard" else f"{kind.upper()}:{item_id}"
+            errors.append(ValidationError("error", label, f"Duplicate {kind} ID"))
+        seen_ids.add(item_id)
+    return errors
+
 class LibraryValidator:
     """Validates the entire library"""
     
-    def __init__(self, library: Library):
+    def __init__(self, library: Library, mac_store: Optional[MACStore] = None):
         self.library = library
+        # Only used by the vectorized mode; built on demand if not supplied
+        self.mac_store = mac_store
         self.errors: List[ValidationError] = []
     
-    def validate_all(self) -> List[ValidationError]:
-        """Run all validations and return list of errors"""
+    def validate_all(self, vectorized: bool = False) -> List[ValidationError]:
+        """
+        Run all validations and return list of errors.
+
+        The vectorized mode reports the same findings, computing each check as
+        whole-array operations over the MAC store and only creating
+        ValidationError objects for failures. Findings are grouped by check
+        like the default mode, but the order within a check may differ.
+        """
         self.errors = []
+        if vectorized:
+            self._validate_all_vectorized()
+            return self.errors
         
         self._validate_mac_vectors()
         self._validate_cluster_references()
@@ -37,115 +131,96 @@ class LibraryValidator:
     def _validate_mac_vectors(self):
         """Check all MAC vectors sum to 1.0"""
         for std in self.library.standards:
-            if not std.mac_vector.is_valid():
-                actual_sum = std.mac_vector.sum()
-                self.errors.append(ValidationError(
-                    "error",
-                    std.id,
-                    f"MAC vector sums to {actual_sum:.4f}, must be 1.0"
-                ))
+            self.errors.extend(check_mac_vector(std))
     
     def _validate_cluster_references(self):
         """Check all standards reference valid clusters"""
         cluster_ids = {c.id for c in self.library.clusters}
         
         for std in self.library.standards:
-            if std.cluster not in cluster_ids:
-                self.errors.append(ValidationError(
-                    "error",
-                    std.id,
-                    f"References non-existent cluster '{std.cluster}'"
-                ))
+            self.errors.extend(check_cluster_reference(std, cluster_ids))
     
     def _validate_duplicate_ids(self):
-        """Check for duplicate standard IDs"""
-        seen_ids = set()
-        
-        for std in self.library.standards:
-            if std.id in seen_ids:
-                self.errors.append(ValidationError(
-                    "error",
-                    std.id,
-                    f"Duplicate standard ID"
-                ))
-            seen_ids.add(std.id)
-        
-        # Check cluster IDs too
-        seen_cluster_ids = set()
-        for cluster in self.library.clusters:
-            if cluster.id in seen_cluster_ids:
-                self.errors.append(ValidationError(
-                    "error",
-                    f"CLUSTER:{cluster.id}",
-                    f"Duplicate cluster ID"
-                ))
-            seen_cluster_ids.add(cluster.id)
+        """Check for duplicate standard and cluster IDs"""
+        self.errors.extend(
+            check_duplicate_ids(std.id for std in self.library.standards)
+        )
+        self.errors.extend(
+            check_duplicate_ids((c.id for c in self.library.clusters), "cluster")
+        )
     
     def _validate_required_fields(self):
         """Check all required fields are present"""
         for std in self.library.standards:
-            if not std.id:
-                self.errors.append(ValidationError("error", "???", "Missing ID"))
-            if not std.name:
-                self.errors.append(ValidationError("error", std.id, "Missing name"))
-            if not std.cluster:
-                self.errors.append(ValidationError("error", std.id, "Missing cluster"))
-            if not (0 <= std.importance_weight <= 1):
-                self.errors.append(ValidationError(
-                    "error",
-                    std.id,
-                    f"Importance weight {std.importance_weight} not in [0,1]"
-                ))
+            self.errors.extend(check_required_fields(std))
     
     def _check_missing_rationales(self):
         """Check for missing rationale text (warnings, not errors)"""
         for std in self.library.standards:
-            rat = std.rationale
-            
-            # Check if any MAC dimension > 0.1 but has no rationale
-            if std.mac_vector.family > 0.1 and not rat.family_rationale.strip():
-                self.errors.append(ValidationError(
-                    "warning",
-                    std.id,
-                    "Missing family_rationale (MAC value > 0.1)"
-                ))
-            if std.mac_vector.group > 0.1 and not rat.group_rationale.strip():
-                self.errors.append(ValidationError(
-                    "warning",
-                    std.id,
-                    "Missing group_rationale (MAC value > 0.1)"
-                ))
-            if std.mac_vector.reciprocity > 0.1 and not rat.reciprocity_rationale.strip():
-                self.errors.append(ValidationError(
-                    "warning",
-                    std.id,
-                    "Missing reciprocity_rationale (MAC value > 0.1)"
-                ))
-            if std.mac_vector.heroism > 0.1 and not rat.heroism_rationale.strip():
-                self.errors.append(ValidationError(
-                    "warning",
-                    std.id,
-                    "Missing heroism_rationale (MAC value > 0.1)"
-                ))
-            if std.mac_vector.deference > 0.1 and not rat.deference_rationale.strip():
-                self.errors.append(ValidationError(
-                    "warning",
-                    std.id,
-                    "Missing deference_rationale (MAC value > 0.1)"
-                ))
-            if std.mac_vector.fairness > 0.1 and not rat.fairness_rationale.strip():
-                self.errors.append(ValidationError(
-                    "warning",
-                    std.id,
-                    "Missing fairness_rationale (MAC value > 0.1)"
-                ))
-            if std.mac_vector.property > 0.1 and not rat.property_rationale.strip():
-                self.errors.append(ValidationError(
-                    "warning",
-                    std.id,
-                    "Missing property_rationale (MAC value > 0.1)"
-                ))
+            self.errors.extend(check_rationales(std))
     
+    def _validate_all_vectorized(self):
+        store = self.mac_store
+        if store is None:
+            store = MACStore.from_library(self.library)
+        ids = store.ids
+        standards = self.library.standards
+
+        # MAC vectors must sum to 1.0
+        sums = store.sums()
+        for row in np.flatnonzero(store.invalid_mask()):
+            self.errors.append(ValidationError(
+                "error",
+                ids[row],
+                f"MAC vector sums to {sums[row]:.4f}, must be 1.0"
+            ))
+
+        # Standards must reference existing clusters
+        valid_codes = [store.cluster_code(c.id) for c in self.library.clusters]
+        for row in np.flatnonzero(~np.isin(store.cluster_codes, valid_codes)):
+            cluster = store.cluster_names[store.cluster_codes[row]]
+            self.errors.append(ValidationError(
+                "error",
+                ids[row],
+                f"References non-existent cluster '{cluster}'"
+            ))
+
+        self._validate_duplicate_ids_vectorized()
+
+        # Required fields
+        if store.row_of("") is not None:
+            self.errors.append(ValidationError("error", "???", "Missing ID"))
+        for row in np.flatnonzero(~store.has_name):
+            self.errors.append(ValidationError("error", ids[row], "Missing name"))
+        for row in np.flatnonzero(store.cluster_codes == store.cluster_code("")):
+            self.errors.append(ValidationError("error", ids[row], "Missing cluster"))
+
+        # The negated form also catches NaN weights
+        weights = store.weights
+        for row in np.flatnonzero(~((weights >= 0) & (weights <= 1))):
+            weight = standards.get(ids[row]).importance_weight
+            self.errors.append(ValidationError(
+                "error",
+                ids[row],
+                f"Importance weight {weight} not in [0,1]"
+            ))
+
+        # Warnings: MAC dimension > 0.1 without rationale text
+        missing = (store.vectors > 0.1) & ~store.has_rationale
+        for row, dim in zip(*np.nonzero(missing)):
+            self.errors.append(ValidationError(
+                "warning",
+                ids[row],
+                f"Missing {MAC_DIMENSIONS[dim]}_rationale (MAC value > 0.1)"
+            ))
+
+    def _validate_duplicate_ids_vectorized(self):
+        # Standards are keyed by ID in both the library and the MAC store, so
+        # duplicate standard IDs cannot reach this point; only clusters are checked.
+        self.errors.extend(
+            check_duplicate_ids((c.id for c in self.library.clusters), "cluster")
+        )
+
     def has_errors(self) -> bool:
         """Check if there are any errors (not warnings)"""
         return any(e.severity == "error" for e in self.errors)
@@ -154,4 +229,72 @@ class LibraryValidator:
         """Return (errors, warnings) separately"""
         errors = [e for e in self.errors if e.severity == "error"]
         warnings = [e for e in self.errors if e.severity == "warning"]
-        return errors, warnings
\ No newline at end of file
+        return errors, warnings
+
+
+class ValidationState:
+    """
+    Live validation findings for a library, kept as a map from standard ID to
+    its errors and warnings. apply() revalidates only the standards touched by
+    a change (plus the standards of a cluster that appeared or disappeared),
+    so the current report never requires a full scan.
+    """
+
+    def __init__(self, library: Library):
+        self.rebuild(library)
+
+    def rebuild(self, library: Library):
+        """Validate every standard from scratch"""
+        self._cluster_ids: Set[str] = {c.id for c in library.clusters}
+        self.findings: Dict[str, List[ValidationError]] = {}
+        self.error_count = 0
+        self.warning_count = 0
+        for std in library.standards:
+            self._store(std.id, validate_standard(std, self._cluster_ids))
+
+    def apply(self, library: Library, changes: Iterable[Change]):
+        """Revalidate what the given changes can have affected"""
+        to_check: Set[str] = set()
+        for change in changes:
+            if change.entity == "standard":
+                to_check.add(change.entity_id)
+                continue
+            # Renames and reorders cannot change findings; only existence matters
+            exists = change.entity_id in library.clusters
+            if exists != (change.entity_id in self._cluster_ids):
+                if exists:
+                    self._cluster_ids.add(change.entity_id)
+                else:
+                    self._cluster_ids.discard(change.entity_id)
+                to_check.update(library.standards.ids_in_cluster(change.entity_id))
+
+        for standard_id in to_check:
+            std = library.standards.get(standard_id)
+            findings = validate_standard(std, self._cluster_ids) if std else []
+            self._store(standard_id, findings)
+
+    def _store(self, standard_id: str, findings: List[ValidationError]):
+        for old in self.findings.pop(standard_id, ()):
+            if old.severity == "error":
+                self.error_count -= 1
+            else:
+                self.warning_count -= 1
+        if findings:
+            self.findings[standard_id] = findings
+            for new in findings:
+                if new.severity == "error":
+                    self.error_count += 1
+                else:
+                    self.warning_count += 1
+
+    def report(self) -> Dict[str, Any]:
+        """Summary counts plus the findings of every standard that has any"""
+        return {
+            "valid": self.error_count == 0,
+            "error_count": self.error_count,
+            "warning_count": self.warning_count,
+            "standards": {
+                standard_id: [f.to_dict() for f in findings]
+                for standard_id, findings in self.findings.items()
+            }
+        }
@@ -0,0 +1,52 @@
+"""
+Benchmark: batched MAC scoring
+
+Builds a synthetic library, scores a batch of random profiles against it in
+one call, checks a sample against a per-standard Python loop and prints the
+time per batch.
+
+    python benchmarks/bench_scoring.py [number_of_standards] [number_of_profiles]
+"""
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+from bench_validator import build_library, timed  # noqa: E402
+from mac_store import MAC_DIMENSIONS, MACStore  # noqa: E402
+
+
+def loop_top_k(library, profile: np.ndarray, k: int):
+    def score(std):
+        return sum(
+            p * getattr(std.mac_vector, dim) for p, dim in zip(profile, MAC_DIMENSIONS)
+        )
+
+    scores = {std.id: std.importance_weight * score(std) for std in library.standards}
+    return sorted(scores, key=scores.get, reverse=True)[:k]
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    queries = int(sys.argv[2]) if len(sys.argv) > 2 else 1_000
+    library = build_library(count)
+    store = MACStore.from_library(library)
+    rng = np.random.default_rng(7)
+    profiles = rng.dirichlet(np.ones(len(MAC_DIMENSIONS)), size=queries)
+    k = 10
+
+    seconds, (rows, _) = timed(lambda: store.top_scores(profiles, k))
+    for q in range(0, queries, max(1, queries // 5)):
+        expected = loop_top_k(library, profiles[q], k)
+        assert [store.ids[row] for row in rows[q]] == expected, f"profile {q} differs"
+
+    print(f"Library: {count} standards, {queries} profiles, top {k}")
+    per_profile = seconds / queries * 1e6
+    print(f"Batch:       {seconds * 1000:8.1f} ms  ({per_profile:.1f} us per profile)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Benchmark: MAC-vector nearest-neighbour search
+
+Builds a synthetic library, checks the top-k results of each metric against
+a brute-force ranking and prints the time taken per query.
+
+    python benchmarks/bench_similarity.py [number_of_standards]
+"""
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+from bench_validator import build_library, timed  # noqa: E402
+from mac_store import SIMILARITY_METRICS, MACStore  # noqa: E402
+
+
+def brute_force(library, query: np.ndarray, k: int, metric: str):
+    def score(std):
+        vector = np.array([
+            getattr(std.mac_vector, dim)
+            for dim in ("family", "group", "reciprocity", "heroism", "deference",
+                        "fairness", "property")
+        ])
+        if metric == "cosine":
+            return vector @ query / (np.linalg.norm(vector) * np.linalg.norm(query))
+        if metric == "l1":
+            return -np.abs(vector - query).sum()
+        return -np.linalg.norm(vector - query)
+    ranked = sorted(library.standards, key=lambda std: -score(std))
+    return [std.id for std in ranked[:k]]
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    library = build_library(count)
+    store = MACStore.from_library(library)
+    query = np.array([0.3, 0.1, 0.1, 0.05, 0.15, 0.2, 0.1])
+    k = 10
+
+    print(f"Library: {count} standards, top {k}")
+    for metric in SIMILARITY_METRICS:
+        seconds, result = timed(
+            lambda: store.nearest(query, k, metric=metric), repeat=20
+        )
+        expected = brute_force(library, query, k, metric)
+        found = [standard_id for standard_id, _ in result]
+        assert found == expected, f"{metric}: results differ"
+        weighted, _ = timed(
+            lambda: store.nearest(query, k, metric=metric, weighted=True), repeat=20
+        )
+        print(
+            f"{metric:<7} {seconds * 1000:8.2f} ms   weighted {weighted * 1000:8.2f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Benchmark: LibraryValidator default mode vs vectorized mode
+
+Builds a synthetic library, checks that both modes report the same findings
+and prints the time taken by each.
+
+    python benchmarks/bench_validator.py [number_of_standards]
+"""
+import os
+import random
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+from file_operations import FileManager  # noqa: E402
+from mac_store import MAC_DIMENSIONS, MACStore  # noqa: E402
+from models import MACRationale, MACVector, Standard  # noqa: E402
+from validator import LibraryValidator  # noqa: E402
+
+
+def build_library(count: int, seed: int = 7):
+    """
+    An empty library's clusters plus `count` random standards, a few of them
+    invalid
+    """
+    rng = random.Random(seed)
+    library = FileManager("unused").create_empty_library()
+    cluster_ids = [c.id for c in library.clusters]
+
+    for i in range(count):
+        raw = [rng.random() ** 3 for _ in MAC_DIMENSIONS]
+        total = sum(raw)
+        values = [v / total for v in raw]
+        if rng.random() < 0.02:
+            values[0] += 0.05  # Does not sum to 1.0
+        rationale = MACRationale(**{
+            f"{dim}_rationale": ("Because." if rng.random() < 0.995 else "")
+            for dim in MAC_DIMENSIONS
+        })
+        library.standards.put(Standard(
+            id=f"STD-{i}",
+            name=f"Standard {i}",
+            cluster=rng.choice(cluster_ids) if rng.random() > 0.01 else "GONE",
+            importance_weight=rng.uniform(0, 1) if rng.random() > 0.01 else 1.5,
+            mac_vector=MACVector(*values),
+            rationale=rationale
+        ))
+    return library
+
+
+def timed(func, repeat: int = 3):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    library = build_library(count)
+    print(f"Library: {count} standards, {len(library.clusters)} clusters")
+
+    loop_time, loop_errors = timed(lambda: LibraryValidator(library).validate_all())
+    build_time, store = timed(lambda: MACStore.from_library(library))
+    vector_time, vector_errors = timed(
+        lambda: LibraryValidator(library, store).validate_all(vectorized=True)
+    )
+
+    def findings(errors):
+        return Counter((e.severity, e.standard_id, e.message) for e in errors)
+
+    assert findings(loop_errors) == findings(vector_errors), "The two modes disagree"
+
+    print(f"Findings:                        {len(loop_errors)}")
+    print(f"Default mode:                    {loop_time * 1000:9.1f} ms")
+    speedup = loop_time / vector_time
+    built_time = build_time + vector_time
+    print(
+        f"Vectorized (store maintained):   {vector_time * 1000:9.1f} ms  "
+        f"({speedup:.1f}x)"
+    )
+    print(f"Vectorized (store built first):  {built_time * 1000:9.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -410,6 +410,82 @@ document.addEventListener("DOMContentLoaded", () => {
         }
     }
 
+    // =================================================================================
+    // --- Live Updates ---
+    // =================================================================================
+    let libraryRevision = null; // Revision of the library data held by the page
+    let syncTimer = null;
+
+    /**
+     * Listens for change notifications from the server, so edits made by other users
+     * appear without a manual refresh. Bursts of notifications cause a single sync.
+     * @returns {void}
+     */
+    function listenForLibraryChanges() {
+        if (!window.EventSource) return;
+        const source = new EventSource("/api/events");
+        const scheduleSync = () => {
+            clearTimeout(syncTimer);
+            syncTimer = setTimeout(syncLibraryChanges, 300);
+        };
+        // Sent on every (re)connect. Catch up on anything missed before it: edits made
+        // after the initial load, whose revision is unknown, or while disconnected.
+        source.addEventListener("hello", (e) => {
+            if (JSON.parse(e.data).revision !== libraryRevision) {
+                scheduleSync();
+            }
+        });
+        source.addEventListener("change", scheduleSync);
+        source.addEventListener("resync", scheduleSync);
+    }
+
+    /**
+     * Applies a list of upserted and deleted items (from /api/changes) to a list of objects with IDs.
+     * @param {object[]} items - The current items.
+     * @param {{upserted: object[], deleted: string[]}} delta - The changes to apply.
+     * @returns {object[]} The updated items.
+     */
+    function mergeChanges(items, delta) {
+        const byId = new Map(items.map(item => [item.id, item]));
+        delta.deleted.forEach(id => byId.delete(id));
+        delta.upserted.forEach(item => byId.set(item.id, item));
+        return Array.from(byId.values());
+    }
+
+    /**
+     * Fetches only what changed since the last known revision and updates the page.
+     * @returns {Promise<void>}
+     */
+    async function syncLibraryChanges() {
+        try {
+            const query = libraryRevision === null ? "" : `?since=${libraryRevision}`;
+            const response = await fetch(`/api/changes${query}`);
+            if (!response.ok) return;
+            const changes = await response.json();
+
+            if (changes.full) {
+                allStandards = changes.standards.upserted;
+                allClusters = changes.clusters.upserted;
+            } else {
+                allStandards = mergeChanges(allStandards, changes.standards);
+                allClusters = mergeChanges(allClusters, changes.clusters);
+            }
+            libraryRevision = changes.revision;
+            allStandards.sort((a, b) => a.id.localeCompare(b.id));
+            allClusters.sort((a, b) => a.order - b.order);
+            standardCountElement.textContent = `Standards: ${allStandards.length}`;
+            clusterCountElement.textContent = `Clusters: ${allClusters.length}`;
+            applyCurrentFilter();
+
+            // Refresh the open standard unless the user is editing it
+            if (currentlySelectedStandard && currentMode === 'view') {
+                displayStandardDetails(currentlySelectedStandard.id);
+            }
+        } catch (error) {
+            console.error("Failed to sync library changes:", error);
+        }
+    }
+
     // =================================================================================
     // --- Event Listeners & UI Actions ---
     // =================================================================================
@@ -1198,6 +1274,7 @@ document.addEventListener("DOMContentLoaded", () => {
                 if (allStandards.length > 0) {
                     displayStandardDetails(allStandards[0].id);
                 }
+                listenForLibraryChanges();
             } else {
                 userActions.innerHTML = `<a href="/login" class="btn">Login with Google</a>`;
                 standardsListElement.innerHTML = "<li>Please login to view standards.</li>";
@@ -0,0 +1,16 @@
+import shutil
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+# The backend modules import each other by bare name, as when run from backend/
+sys.path.insert(0, str(ROOT / "backend"))
+
+@pytest.fixture
+def data_path(tmp_path, monkeypatch):
+    """A DATA_PATH holding a copy of the sample library"""
+    shutil.copy(ROOT / "standards_library" / "library.json", tmp_path / "library.json")
+    monkeypatch.setenv("DATA_PATH", str(tmp_path))
+    return tmp_path
@@ -0,0 +1,27 @@
+import json
+
+from file_operations import FileManager
+
+
+def save_revision(file_manager, data, revision):
+    data["revision"] = revision
+    file_manager.library_file.write_text(json.dumps(data, indent=2), encoding="utf-8")
+    return file_manager.create_backup()
+
+def test_backup_after_a_damaged_newest_backup_is_stored_in_full(data_path):
+    file_manager = FileManager(str(data_path))
+    store = file_manager.backup_store
+    data = json.loads(file_manager.library_file.read_text(encoding="utf-8"))
+    save_revision(file_manager, data, 1)
+    damaged = save_revision(file_manager, data, 2)
+    assert store.get(damaged)["kind"] == "delta"
+
+    (store.objects_dir / store.get(damaged)["object"]).write_bytes(b"garbage")
+    # A restarted worker has nothing cached
+    file_manager = FileManager(str(data_path))
+    store = file_manager.backup_store
+    newest = save_revision(file_manager, data, 3)
+
+    assert newest is not None
+    assert store.get(newest)["kind"] == "full"
+    assert json.loads(store.read(newest))["revision"] == 3
@@ -0,0 +1,49 @@
+import threading
+import time
+
+from job_runner import JobRunner
+
+
+def wait_until_finished(runner, job_id):
+    for _ in range(200):
+        state = runner.get(job_id)
+        if state and state["status"] in ("succeeded", "failed"):
+            return state
+        time.sleep(0.01)
+    return runner.get(job_id)
+
+def test_another_worker_can_report_a_job(tmp_path):
+    # Two runners on one directory stand in for two worker processes
+    accepting, polled = JobRunner(tmp_path), JobRunner(tmp_path)
+    release = threading.Event()
+
+    def operation(job):
+        job.progress(1, 2)
+        release.wait(5)
+        return {"filename": "export.json"}
+
+    job = accepting.submit("export", operation)
+    time.sleep(0.1)
+    assert polled.get(job.id)["status"] == "running"
+
+    release.set()
+    state = wait_until_finished(polled, job.id)
+    assert state["status"] == "succeeded"
+    assert state["result"] == {"filename": "export.json"}
+
+def test_forgotten_jobs_are_removed_from_disk(tmp_path):
+    runner = JobRunner(tmp_path, max_finished=1)
+    first = runner.submit("backup", lambda job: None)
+    wait_until_finished(runner, first.id)
+    second = runner.submit("backup", lambda job: None)
+    wait_until_finished(runner, second.id)
+    runner.submit("backup", lambda job: None)
+
+    assert runner.get(first.id) is None
+    assert not (tmp_path / f"{first.id}.json").exists()
+
+def test_unknown_or_malformed_job_ids_are_not_found(tmp_path):
+    runner = JobRunner(tmp_path)
+
+    assert runner.get("0" * 32) is None
+    assert runner.get("../library") is None
@@ -0,0 +1,82 @@
+import io
+import json
+
+import pytest
+from library_controller import LibraryController
+
+
+def saved_library(data_path):
+    with open(data_path / "library.json", encoding="utf-8") as f:
+        return json.load(f)
+
+def test_create_cluster_sees_changes_from_other_workers(data_path):
+    a = LibraryController()
+    b = LibraryController()
+    standard_id = next(iter(a.library.standards)).id
+
+    a.delete_standard(standard_id)
+    b.create_cluster({"id": "ZZ", "name": "New", "description": "", "order": 1})
+
+    assert "ZZ" in b.library.clusters
+    assert standard_id not in b.library.standards
+    saved = saved_library(data_path)
+    assert "ZZ" in [c["id"] for c in saved["clusters"]]
+    assert standard_id not in [s["id"] for s in saved["standards"]]
+
+def test_journal_keeps_edits_after_a_torn_record(data_path, monkeypatch):
+    monkeypatch.setenv("LIBRARY_JOURNAL", "1")
+    with open(data_path / "library.journal", "w", encoding="utf-8") as f:
+        f.write('{"rev": 99999, "changes": [')
+
+    controller = LibraryController()
+    standard_id = next(iter(controller.library.standards)).id
+    form_data = controller.library.standards.get(standard_id).to_dict()
+    controller.update_standard(standard_id, dict(form_data, name="AFTER_TORN"))
+
+    reloaded = LibraryController()
+    assert reloaded.library.standards.get(standard_id).name == "AFTER_TORN"
+    assert reloaded.revision == controller.revision
+
+def test_restore_accepts_a_backup_with_a_new_standard(data_path):
+    controller = LibraryController()
+    cluster_id = next(iter(controller.library.clusters)).id
+    controller.create_standard({"id": "NEW-1", "name": "New", "cluster": cluster_id})
+    backup = controller.get_backup_content(controller.create_backup())
+
+    stats = controller.restore_from_file(io.BytesIO(backup))
+
+    assert stats["validation_errors"] == 1
+    assert "NEW-1" in controller.library.standards
+
+def test_restore_rejects_duplicate_ids(data_path):
+    controller = LibraryController()
+    data = saved_library(data_path)
+    data["standards"].append(data["standards"][0])
+
+    with pytest.raises(ValueError, match="duplicate"):
+        controller.restore_from_file(io.BytesIO(json.dumps(data).encode("utf-8")))
+    assert saved_library(data_path)["standards"] == data["standards"][:-1]
+
+def test_library_with_duplicate_ids_is_refused_not_collapsed(data_path):
+    data = saved_library(data_path)
+    data["standards"].append(dict(data["standards"][0], name="Second copy"))
+    (data_path / "library.json").write_text(json.dumps(data), encoding="utf-8")
+
+    with pytest.raises(Exception, match="could not be loaded"):
+        LibraryController()
+    assert saved_library(data_path) == data
+
+def test_export_files_are_pruned(data_path):
+    controller = LibraryController()
+    controller.file_manager.max_exports = 2
+
+    filenames = [controller.export_to_file({}) for _ in range(3)]
+
+    kept = sorted(p.name for p in (data_path / "exports").glob("library_export_*.json"))
+    assert kept == sorted(filenames[1:])
+
+def test_search_limit_errors_name_the_limit_parameter(data_path):
+    controller = LibraryController()
+
+    with pytest.raises(ValueError, match="'limit' must be between 1 and"):
+        controller.search_standards("con", 500)
@@ -0,0 +1,30 @@
+from file_operations import FileManager
+from search_index import SearchIndex
+
+
+def build_index(data_path):
+    library = FileManager(str(data_path)).load_library()
+    return library, SearchIndex(library)
+
+def matching(index, predicate):
+    return {
+        standard_id for standard_id, terms in index._terms_of.items()
+        if any(predicate(term) for term in terms)
+    }
+
+def test_prefix_search_finds_every_matching_standard(data_path):
+    library, index = build_index(data_path)
+    expected = matching(index, lambda term: term.startswith("con"))
+
+    results = index.search("con", limit=len(library.standards))
+
+    assert len(expected) > 20
+    assert {standard_id for standard_id, _ in results} == expected
+
+def test_short_words_only_match_whole_terms(data_path):
+    library, index = build_index(data_path)
+
+    results = index.search("to", limit=len(library.standards))
+
+    expected = matching(index, lambda term: term == "to")
+    assert {standard_id for standard_id, _ in results} == expected
@@ -0,0 +1,94 @@
+import pytest
+from library_controller import LibraryController
+
+
+def all_pages(controller, limit, sort="id", between_pages=None, **kwargs):
+    """Follows next_cursor to the end, calling between_pages() after the first page"""
+    page = controller.get_standards_page(limit, sort=sort, **kwargs)
+    pages = [page]
+    while page["next_cursor"]:
+        if between_pages and len(pages) == 1:
+            between_pages()
+        page = controller.get_standards_page(
+            limit, page["next_cursor"], sort=sort, **kwargs
+        )
+        pages.append(page)
+    return pages
+
+def ids_of(pages):
+    return [std["id"] for page in pages for std in page["standards"]]
+
+def by_weight_descending(controller):
+    ranked = sorted(
+        controller.library.standards,
+        key=lambda std: (std.importance_weight, std.id),
+        reverse=True
+    )
+    return [std.id for std in ranked]
+
+def test_pages_in_ascending_order(data_path):
+    controller = LibraryController()
+    expected = sorted(std.id for std in controller.library.standards)
+
+    pages = all_pages(controller, 7)
+
+    assert ids_of(pages) == expected
+    assert all(len(page["standards"]) == 7 for page in pages[:-1])
+    assert all(page["total"] == len(expected) for page in pages)
+
+def test_pages_in_descending_order_break_ties_by_id(data_path):
+    controller = LibraryController()
+    expected = by_weight_descending(controller)
+
+    pages = all_pages(controller, 7, sort="-importance_weight")
+
+    assert ids_of(pages) == expected
+
+def test_cursor_survives_deletes(data_path):
+    controller = LibraryController()
+    first = controller.get_standards_page(5)
+    seen = [std["id"] for std in first["standards"]]
+    unseen = sorted(std.id for std in controller.library.standards)[5:]
+
+    # The standard the cursor points after, and one not yet reached
+    controller.delete_standard(seen[-1])
+    controller.delete_standard(unseen[0])
+    page = controller.get_standards_page(len(unseen), first["next_cursor"])
+
+    assert [std["id"] for std in page["standards"]] == unseen[1:]
+
+def test_edits_between_pages_neither_repeat_nor_skip_other_standards(data_path):
+    controller = LibraryController()
+    before = by_weight_descending(controller)
+    edited = before[2]
+
+    def move_edited_to_the_end():
+        std = controller.library.standards.get(edited)
+        controller.update_standard(edited, dict(std.to_dict(), importance_weight=0.0))
+
+    pages = all_pages(
+        controller, 5, sort="-importance_weight", between_pages=move_edited_to_the_end
+    )
+    ids = ids_of(pages)
+
+    # The edited standard moved behind the cursor, so it is listed a second time
+    assert ids.count(edited) == 2
+    assert [i for i in ids if i != edited] == [i for i in before if i != edited]
+
+def test_projection_returns_only_the_requested_fields(data_path):
+    controller = LibraryController()
+
+    page = controller.get_standards_page(3, fields=["id", "importance_weight"])
+
+    for row in page["standards"]:
+        std = controller.library.standards.get(row["id"])
+        assert row == {"id": std.id, "importance_weight": std.importance_weight}
+    with pytest.raises(ValueError, match="Unknown field"):
+        controller.get_standards_page(3, fields=["id", "secret"])
+
+def test_cursor_of_another_sort_is_rejected(data_path):
+    controller = LibraryController()
+    cursor = controller.get_standards_page(3, sort="-importance_weight")["next_cursor"]
+
+    with pytest.raises(ValueError, match="cursor"):
+        controller.get_standards_page(3, cursor, sort="id")
@@ -0,0 +1,27 @@
+import json
+import os
+import signal
+
+import pytest
+from user_registry import UserRegistry
+
+
+@pytest.mark.skipif(not hasattr(signal, "SIGHUP"), reason="SIGHUP is not available")
+def test_sighup_reloads_users(tmp_path):
+    users_file = tmp_path / "users.json"
+    users_file.write_text(json.dumps({"users": {"a@example.com": "editor"}}))
+    registry = UserRegistry(str(users_file), check_interval=3600)
+    previous = signal.getsignal(signal.SIGHUP)
+    try:
+        registry.reload_on_signal()
+        assert registry.get_role("a@example.com") == "editor"
+
+        # Same size and, on coarse clocks, possibly the same mtime: only the signal
+        # reveals it
+        users_file.write_text(json.dumps({"users": {"a@example.com": "admin1"}}))
+        assert registry.get_role("a@example.com") == "editor"
+        os.kill(os.getpid(), signal.SIGHUP)
+
+        assert registry.get_role("a@example.com") == "admin1"
+    finally:
+        signal.signal(signal.SIGHUP, previous)